@@ -0,0 +1,288 @@
+import importlib
+import importlib.util
+import math
+import random
+import numpy as np
+from particles import ParticleSystem, thermal_speed
+from event_engine import EventDrivenEngine
+from profiler import DISABLED
+
+# -------------------------------
+# Backend registry
+# -------------------------------
+# Every physics implementation exposes the same small interface (see Backend)
+# and registers itself under a name, so both front ends, the headless runner
+# and the benchmarks can pick one at runtime without touching drawing code.
+BACKENDS = {}
+# Backends whose module needs an optional dependency: name -> (module, the
+# dependency). The module is imported (and registers itself) the first time
+# the backend is asked for, so a heavy dependency is never loaded otherwise.
+OPTIONAL_BACKENDS = {"numba": ("numba_backend", "numba")}
+
+
+def register_backend(name):
+    def register(cls):
+        cls.name = name
+        BACKENDS[name] = cls
+        return cls
+    return register
+
+
+def get_backend(name):
+    if name not in BACKENDS and name in OPTIONAL_BACKENDS:
+        module, dependency = OPTIONAL_BACKENDS[name]
+        if importlib.util.find_spec(dependency) is not None:
+            importlib.import_module(module)
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"unknown physics backend {name!r} "
+                         f"(available: {', '.join(available_backends())})") from None
+
+
+def available_backends():
+    # Optional backends are listed when their dependency is installed.
+    optional = [name for name, (_, dependency) in OPTIONAL_BACKENDS.items()
+                if name not in BACKENDS and importlib.util.find_spec(dependency) is not None]
+    return list(BACKENDS) + optional
+
+
+class Backend:
+    name = None
+
+    def __init__(self, num_molecules, container_rect, temperature, radius=3, speed_factor=0.5,
+                 seed=None, collisions=True, brute_force=False):
+        self.container_rect = container_rect
+        self.temperature = temperature
+        self.speed_factor = speed_factor
+        self.collisions = collisions
+        # Find contacts by testing every pair instead of through the uniform
+        # grid. Much slower; for checking the grid search against.
+        self.brute_force = brute_force
+        self.profiler = DISABLED
+
+    def __len__(self):
+        raise NotImplementedError
+
+    # --- Controls (piston and temperature) ---
+    def set_container(self, container_rect):
+        self.container_rect = container_rect
+
+    def set_temperature(self, temperature):
+        self.temperature = temperature
+
+    # --- Physics ---
+    def step(self, dt):
+        raise NotImplementedError
+
+    # --- State queries ---
+    def state(self):
+        # (x, y, vx, vy) arrays, velocities in absolute units (pixels/second).
+        raise NotImplementedError
+
+    def take_wall_impulse(self):
+        # Momentum delivered to the walls and piston since the last call.
+        raise NotImplementedError
+
+    # --- Checkpoints ---
+    def get_state(self):
+        # ({name: array}, JSON-compatible dict): everything needed to carry on
+        # exactly where this backend is now, RNG state included.
+        raise NotImplementedError
+
+    def set_state(self, arrays, extra):
+        raise NotImplementedError
+
+
+# -------------------------------
+# Pure-Python reference backend
+# -------------------------------
+class Molecule:
+    def __init__(self, container_rect, temperature, speed_factor=0.5, rng=random):
+        self.container_rect = container_rect
+        self.x = rng.uniform(container_rect[0] + 5, container_rect[2] - 5)
+        self.y = rng.uniform(container_rect[1] + 5, container_rect[3] - 5)
+        angle = rng.uniform(0, 2 * math.pi)
+        self.vx = math.cos(angle)
+        self.vy = math.sin(angle)
+        self.speed_factor = speed_factor
+        self.speed = thermal_speed(temperature, speed_factor)
+        self.radius = 3
+
+    def check_collision(self, other):
+        dx = self.x - other.x
+        dy = self.y - other.y
+        distance_sq = dx*dx + dy*dy
+        min_distance = self.radius + other.radius
+        if distance_sq < min_distance*min_distance:
+            # Simple elastic collision response (can be improved for accuracy)
+            self.vx, other.vx = other.vx, self.vx
+            self.vy, other.vy = other.vy, self.vy
+            # Separate molecules slightly to avoid sticking
+            overlap = min_distance - math.sqrt(distance_sq)
+            self.x += overlap * (self.x - other.x) / math.sqrt(distance_sq) if distance_sq != 0 else overlap / 2
+            self.y += overlap * (self.y - other.y) / math.sqrt(distance_sq) if distance_sq != 0 else overlap / 2
+            other.x -= overlap * (self.x - other.x) / math.sqrt(distance_sq) if distance_sq != 0 else overlap / 2
+            other.y -= overlap * (self.y - other.y) / math.sqrt(distance_sq) if distance_sq != 0 else overlap / 2
+
+    def update(self, dt, temperature, container_rect):
+        # Returns the momentum delivered to the walls during this update.
+        self.speed = thermal_speed(temperature, self.speed_factor)
+        self.x += self.vx * self.speed * dt
+        self.y += self.vy * self.speed * dt
+
+        impulse = 0.0
+        left, top, right, bottom = container_rect
+        if self.x - self.radius < left:
+            self.x = left + self.radius
+            self.vx = -self.vx
+            impulse += abs(self.vx)
+        if self.y - self.radius < top:
+            self.y = top + self.radius
+            self.vy = -self.vy
+            impulse += abs(self.vy)
+        if self.y + self.radius > bottom:
+            self.y = bottom - self.radius
+            self.vy = -self.vy
+            impulse += abs(self.vy)
+        if self.x + self.radius > right:
+            self.x = right - self.radius
+            self.vx = -self.vx
+            impulse += abs(self.vx)
+
+        norm = math.sqrt(self.vx**2 + self.vy**2)
+        if norm:
+            self.vx /= norm
+            self.vy /= norm
+        return 2 * self.speed * impulse
+
+
+@register_backend("python")
+class PythonBackend(Backend):
+    # One Molecule object per particle and an O(N^2) collision loop: the
+    # original model, kept as a readable reference implementation. It always
+    # tests every pair, so brute_force changes nothing here.
+    def __init__(self, num_molecules, container_rect, temperature, radius=3, speed_factor=0.5,
+                 seed=None, collisions=True, brute_force=False):
+        super().__init__(num_molecules, container_rect, temperature, radius, speed_factor,
+                         seed, collisions, brute_force)
+        self.rng = random.Random(seed)
+        self.molecules = [Molecule(container_rect, temperature, speed_factor, self.rng)
+                          for _ in range(num_molecules)]
+        for molecule in self.molecules:
+            molecule.radius = radius
+        self.wall_impulse = 0.0
+
+    def __len__(self):
+        return len(self.molecules)
+
+    def step(self, dt):
+        molecules = self.molecules
+        if self.collisions:
+            with self.profiler.phase("collisions"):
+                for i in range(len(molecules)):
+                    for j in range(i + 1, len(molecules)):
+                        molecules[i].check_collision(molecules[j])
+        with self.profiler.phase("molecule update"):
+            for molecule in molecules:
+                self.wall_impulse += molecule.update(dt, self.temperature, self.container_rect)
+
+    def state(self):
+        x = np.array([m.x for m in self.molecules])
+        y = np.array([m.y for m in self.molecules])
+        vx = np.array([m.vx * m.speed for m in self.molecules])
+        vy = np.array([m.vy * m.speed for m in self.molecules])
+        return x, y, vx, vy
+
+    def take_wall_impulse(self):
+        impulse, self.wall_impulse = self.wall_impulse, 0.0
+        return impulse
+
+    def get_state(self):
+        arrays = {name: np.array([getattr(m, name) for m in self.molecules])
+                  for name in ("x", "y", "vx", "vy", "speed", "radius")}
+        version, internal, gauss_next = self.rng.getstate()
+        extra = {"rng": [version, list(internal), gauss_next], "wall_impulse": self.wall_impulse}
+        return arrays, extra
+
+    def set_state(self, arrays, extra):
+        for k, molecule in enumerate(self.molecules):
+            for name in ("x", "y", "vx", "vy", "speed", "radius"):
+                setattr(molecule, name, float(arrays[name][k]))
+        version, internal, gauss_next = extra["rng"]
+        self.rng.setstate((version, tuple(internal), gauss_next))
+        self.wall_impulse = extra["wall_impulse"]
+
+
+# -------------------------------
+# Vectorized (NumPy) backends
+# -------------------------------
+@register_backend("stepper")
+class VectorizedBackend(Backend):
+    def __init__(self, num_molecules, container_rect, temperature, radius=3, speed_factor=0.5,
+                 seed=None, collisions=True, brute_force=False):
+        super().__init__(num_molecules, container_rect, temperature, radius, speed_factor,
+                         seed, collisions, brute_force)
+        self.particles = ParticleSystem(num_molecules, container_rect, temperature, radius,
+                                        speed_factor, seed, brute_force)
+
+    def __len__(self):
+        return len(self.particles)
+
+    def step(self, dt):
+        if self.collisions:
+            with self.profiler.phase("collisions"):
+                self.particles.collide(self.container_rect)
+        with self.profiler.phase("molecule update"):
+            self.particles.update(dt, self.temperature, self.container_rect)
+
+    def state(self):
+        p = self.particles
+        return p.x, p.y, p.vx, p.vy
+
+    def take_wall_impulse(self):
+        p = self.particles
+        impulse, p.wall_impulse = p.wall_impulse, 0.0
+        return impulse
+
+    def get_state(self):
+        p = self.particles
+        arrays = {"x": p.x, "y": p.y, "vx": p.vx, "vy": p.vy, "radius": p.radius,
+                  "species": p.species}
+        extra = {"rng": p.rng.bit_generator.state, "speed": p.speed,
+                 "wall_impulse": p.wall_impulse, "wall_rect": p.wall_rect}
+        return arrays, extra
+
+    def set_state(self, arrays, extra):
+        # Copy in place: the event engine holds on to the velocity arrays.
+        p = self.particles
+        for name in ("x", "y", "vx", "vy", "radius", "species"):
+            getattr(p, name)[:] = arrays[name]
+        p.rng.bit_generator.state = extra["rng"]
+        p.speed = extra["speed"]
+        p.wall_impulse = extra["wall_impulse"]
+        p.wall_rect = tuple(extra["wall_rect"]) if extra.get("wall_rect") else None
+
+
+@register_backend("event")
+class EventBackend(VectorizedBackend):
+    # Exact hard-sphere collisions; molecules always collide in this mode.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.engine = EventDrivenEngine(self.particles)
+
+    def step(self, dt):
+        with self.profiler.phase("event engine"):
+            self.engine.step(dt, self.temperature, self.container_rect)
+
+    def get_state(self):
+        arrays, extra = super().get_state()
+        extra.update(engine_time=self.engine.time, engine_collisions=self.engine.collisions)
+        return arrays, extra
+
+    def set_state(self, arrays, extra):
+        super().set_state(arrays, extra)
+        # Every particle clock is synchronised at the end of a step.
+        self.engine.time = extra["engine_time"]
+        self.engine.last_time[:] = self.engine.time
+        self.engine.collisions = extra["engine_collisions"]
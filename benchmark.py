@@ -0,0 +1,268 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+# Render offscreen; no window is ever opened.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+import pygame
+import gas_simulator
+from backends import Molecule, available_backends
+from particles import ParticleSystem
+from simulation import CONTAINER, Simulation
+from ensemble import Ensemble
+
+SIZES = (50, 500, 5000, 50000, 100000)
+# The O(N^2) reference paths are only timed up to these sizes.
+LEGACY_COLLISION_LIMIT = 1000
+BRUTE_FORCE_LIMIT = 5000
+# Backends that only make sense for small or dilute systems.
+STEP_LIMITS = {"python": 1000, "event": 1000}
+# Replicas per ensemble; the molecule count is per replica.
+REPLICAS = 16
+ENSEMBLE_LIMIT = 5000
+
+
+# -------------------------------
+# Timing helpers
+# -------------------------------
+def measure(operation, budget=0.5, min_repeats=3, max_repeats=1000):
+    # Repeat `operation` until the time budget is spent; report the median.
+    times = []
+    start = time.perf_counter()
+    while len(times) < min_repeats or (time.perf_counter() - start < budget and len(times) < max_repeats):
+        t0 = time.perf_counter()
+        operation()
+        times.append(time.perf_counter() - t0)
+    median = float(np.median(times))
+    return {"seconds": median, "per_second": 1.0 / median if median > 0 else float("inf"),
+            "repeats": len(times)}
+
+
+RECT = (CONTAINER[0], CONTAINER[1], 500, CONTAINER[2])
+
+
+def make_simulation(n, seed, physics="stepper"):
+    return Simulation(n, temperature=120, piston=500, seed=seed, physics=physics)
+
+
+def make_particles(n, seed):
+    return ParticleSystem(n, RECT, 120, seed=seed)
+
+
+def legacy_molecules(n, seed):
+    rng = random.Random(seed)
+    return [Molecule(RECT, 120, rng=rng) for _ in range(n)]
+
+
+# -------------------------------
+# Benchmark cases
+# -------------------------------
+def bench_update(n, seed, budget):
+    particles = make_particles(n, seed)
+    results = {"update/vectorized": measure(lambda: particles.update(1 / 60, 120, RECT), budget)}
+    molecules = legacy_molecules(n, seed)
+
+    def legacy():
+        for molecule in molecules:
+            molecule.update(1 / 60, 120, RECT)
+    results["update/legacy"] = measure(legacy, budget)
+    return results
+
+
+def bench_collisions(n, seed, budget):
+    particles = make_particles(n, seed)
+    results = {"collisions/grid": measure(lambda: particles.collide(RECT), budget)}
+    if n <= BRUTE_FORCE_LIMIT:
+        brute = make_particles(n, seed)
+        brute.brute_force = True
+        results["collisions/brute_force"] = measure(lambda: brute.collide(RECT), budget)
+    if n <= LEGACY_COLLISION_LIMIT:
+        molecules = legacy_molecules(n, seed)
+
+        def legacy():
+            for i in range(n):
+                for j in range(i + 1, n):
+                    molecules[i].check_collision(molecules[j])
+        results["collisions/legacy"] = measure(legacy, budget)
+    return results
+
+
+def bench_coupling(n, seed, budget):
+    sim = make_simulation(n, seed)
+    pistons = np.linspace(200, 800, 64).tolist()
+
+    def coupling():
+        # One drag sweep of the piston plus one temperature change.
+        for piston in pistons:
+            sim.move_piston(piston)
+        sim.set_temperature(120)
+    return {"coupling": measure(coupling, budget)}
+
+
+def bench_step(n, seed, budget):
+    # One full Simulation.step per registered backend.
+    results = {}
+    for physics in available_backends():
+        if n > STEP_LIMITS.get(physics, n):
+            continue
+        sim = make_simulation(n, seed, physics)
+        results[f"step/{physics}"] = measure(lambda: sim.step(1 / 60), budget)
+    return results
+
+
+def bench_ensemble(n, seed, budget):
+    # One batched step of REPLICAS containers against stepping them one by one.
+    if n > ENSEMBLE_LIMIT:
+        return {}
+    ensemble = Ensemble(REPLICAS, n, temperature=120, piston=500, seed=seed)
+    sims = [make_simulation(n, seed + k) for k in range(REPLICAS)]
+
+    def separate():
+        for sim in sims:
+            sim.step(1 / 60)
+    return {"ensemble/batched": measure(lambda: ensemble.step(1 / 60), budget),
+            "ensemble/separate": measure(separate, budget)}
+
+
+def bench_render(n, seed, budget):
+    sim = make_simulation(n, seed)
+    renderer = gas_simulator.Renderer()
+    surface = pygame.Surface((1000, 700))
+    state = sim.snapshot()
+
+    def full_frame():
+        renderer.invalidate()
+        renderer.draw(surface, state)
+    results = {"render": measure(full_frame, budget)}
+    # Steady state: new molecule positions every frame, gauges and sliders
+    # unchanged, so only the dirty regions are repainted.
+    sim.step(1 / 60)
+    states = itertools.cycle([state, sim.snapshot()])
+    results["render/dirty"] = measure(lambda: renderer.draw(surface, next(states)), budget)
+    return results
+
+
+CASES = {
+    "update": bench_update,
+    "collisions": bench_collisions,
+    "coupling": bench_coupling,
+    "step": bench_step,
+    "ensemble": bench_ensemble,
+    "render": bench_render,
+}
+
+
+def run(sizes=SIZES, cases=tuple(CASES), seed=0, budget=0.5, label=None):
+    pygame.init()
+    results = {}
+    for n in sizes:
+        for case in cases:
+            for name, result in CASES[case](n, seed, budget).items():
+                key = f"{name}/{n}"
+                results[key] = result
+                print(f"{key:32} {result['seconds'] * 1000:10.3f} ms  {result['per_second']:12.1f} /s",
+                      file=sys.stderr)
+    pygame.quit()
+    return {
+        "label": label or time.strftime("%Y-%m-%d %H:%M:%S"),
+        "timestamp": time.time(),
+        "seed": seed,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pygame": pygame.version.ver,
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+# -------------------------------
+# JSON history and comparison
+# -------------------------------
+def load_history(path):
+    if not os.path.exists(path):
+        return {"runs": []}
+    with open(path) as stream:
+        return json.load(stream)
+
+
+def save_history(history, path):
+    with open(path, "w") as stream:
+        json.dump(history, stream, indent=1)
+        stream.write("\n")
+
+
+def find_run(history, key):
+    # A run is picked by label or by (negative) position in the history.
+    runs = history["runs"]
+    for entry in runs:
+        if entry["label"] == key:
+            return entry
+    try:
+        return runs[int(key)]
+    except (ValueError, IndexError):
+        raise SystemExit(f"no benchmark run {key!r} in history")
+
+
+def compare(base, head, threshold):
+    # Returns (case, base /s, head /s, relative change) for shared cases and
+    # the list of cases whose throughput dropped by more than `threshold`.
+    rows = []
+    regressions = []
+    for key in sorted(set(base["results"]) & set(head["results"])):
+        before = base["results"][key]["per_second"]
+        after = head["results"][key]["per_second"]
+        change = after / before - 1 if before else 0.0
+        rows.append((key, before, after, change))
+        if change < -threshold:
+            regressions.append(key)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the physics and render paths.")
+    parser.add_argument("--history", default="benchmarks.json", help="JSON history file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the suite and append it to the history")
+    run_parser.add_argument("--sizes", default=",".join(map(str, SIZES)),
+                            help="comma-separated molecule counts")
+    run_parser.add_argument("--cases", default=",".join(CASES), help="comma-separated cases")
+    run_parser.add_argument("--seed", type=int, default=0, help="seed for the initial conditions")
+    run_parser.add_argument("--budget", type=float, default=0.5, help="seconds spent per case")
+    run_parser.add_argument("--label", default=None, help="name of this run (default: timestamp)")
+
+    compare_parser = commands.add_parser("compare", help="compare two runs from the history")
+    compare_parser.add_argument("base", nargs="?", default="-2", help="label or index (default: -2)")
+    compare_parser.add_argument("head", nargs="?", default="-1", help="label or index (default: -1)")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="flag throughput drops larger than this fraction")
+    args = parser.parse_args(argv)
+
+    history = load_history(args.history)
+    if args.command == "run":
+        sizes = [int(n) for n in args.sizes.split(",")]
+        cases = [case for case in args.cases.split(",") if case]
+        history["runs"].append(run(sizes, cases, args.seed, args.budget, args.label))
+        save_history(history, args.history)
+        return 0
+
+    base = find_run(history, args.base)
+    head = find_run(history, args.head)
+    rows, regressions = compare(base, head, args.threshold)
+    print(f"{base['label']} -> {head['label']}")
+    for key, before, after, change in rows:
+        flag = "  REGRESSION" if key in regressions else ""
+        print(f"{key:32} {before:12.1f} {after:12.1f} /s  {change:+7.1%}{flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
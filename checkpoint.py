@@ -0,0 +1,102 @@
+import json
+import os
+import struct
+import numpy as np
+from simulation import Simulation
+
+# -------------------------------
+# Checkpoint file format
+# -------------------------------
+# header    magic, format version, metadata length (16 bytes)
+# metadata  UTF-8 JSON: coupling state (piston and temperature slider values,
+#           K, gamma), step count and time, pressure gauge position, the
+#           backend's scalar and RNG state, and the layout of the arrays
+# arrays    raw little-endian array data, each starting on an 8-byte boundary
+#
+# Arrays are stored at full precision, so a restored run continues exactly
+# where the saved one stopped. Files are written to a temporary name and then
+# renamed over the target, so a crash mid-save never destroys the previous
+# checkpoint.
+MAGIC = b"GASCKPT\0"
+VERSION = 1
+HEADER = struct.Struct("<8sII")
+
+
+def pad(length):
+    return -length % 8
+
+
+def save_checkpoint(sim, path):
+    arrays, extra = sim.backend.get_state()
+    gauge = sim.pressure_gauge
+    arrays = dict(arrays, gauge_impulses=gauge.impulses, gauge_durations=gauge.durations)
+    arrays = {name: np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+              for name, array in arrays.items()}
+    metadata = {
+        "physics": sim.backend.name,
+        "num_molecules": sim.num_molecules,
+        "container": [sim.container_left, sim.container_top, sim.container_bottom],
+        "piston": sim.piston,
+        "temperature": sim.temperature,
+        "K": sim.K,
+        "gamma": sim.gamma,
+        "speed_factor": sim.speed_factor,
+        "collisions": sim.backend.collisions,
+        "brute_force": sim.backend.brute_force,
+        "step_count": sim.step_count,
+        "time": sim.time,
+        "gauge": [gauge.index, gauge.total_impulse, gauge.total_time],
+        "backend": extra,
+        "arrays": [[name, array.dtype.str, list(array.shape)] for name, array in arrays.items()],
+    }
+    encoded = json.dumps(metadata).encode("utf-8")
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as stream:
+        stream.write(HEADER.pack(MAGIC, VERSION, len(encoded)))
+        stream.write(encoded + b"\0" * pad(len(encoded)))
+        for array in arrays.values():
+            data = array.tobytes()
+            stream.write(data + b"\0" * pad(len(data)))
+        stream.flush()
+        os.fsync(stream.fileno())
+    os.replace(temporary, path)
+
+
+def load_checkpoint(path):
+    # Returns a Simulation in exactly the saved state.
+    with open(path, "rb") as stream:
+        data = stream.read()
+    magic, version, length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a checkpoint file")
+    if version != VERSION:
+        raise ValueError(f"{path}: unsupported checkpoint version {version}")
+    offset = HEADER.size
+    metadata = json.loads(data[offset:offset + length].decode("utf-8"))
+    offset += length + pad(length)
+    arrays = {}
+    for name, dtype, shape in metadata["arrays"]:
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        arrays[name] = np.frombuffer(data, dtype, count, offset).reshape(shape).copy()
+        offset += count * dtype.itemsize + pad(count * dtype.itemsize)
+
+    gauge_impulses = arrays.pop("gauge_impulses")
+    gauge_durations = arrays.pop("gauge_durations")
+    sim = Simulation(metadata["num_molecules"], metadata["temperature"], metadata["piston"],
+                     metadata["gamma"], physics=metadata["physics"],
+                     container=tuple(metadata["container"]), speed_factor=metadata["speed_factor"],
+                     pressure_window=len(gauge_impulses), collisions=metadata["collisions"],
+                     brute_force=metadata.get("brute_force", False))
+    sim.K = metadata["K"]
+    sim.step_count = metadata["step_count"]
+    sim.time = metadata["time"]
+    sim.backend.set_container(sim.container_rect)
+    sim.backend.set_temperature(sim.temperature)
+    sim.backend.set_state(arrays, metadata["backend"])
+    gauge = sim.pressure_gauge
+    gauge.impulses[:] = gauge_impulses
+    gauge.durations[:] = gauge_durations
+    gauge.index, gauge.total_impulse, gauge.total_time = metadata["gauge"]
+    return sim
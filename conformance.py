@@ -0,0 +1,196 @@
+import argparse
+import sys
+import numpy as np
+from backends import available_backends, get_backend
+from ensemble import EnsembleBackend
+from particles import thermal_speed
+
+# -------------------------------
+# Backend conformance kit
+# -------------------------------
+# Behaviour every registered physics backend must share, whatever its speed.
+# Run `python conformance.py` (optionally with backend names) before
+# registering a new backend; each check raises AssertionError on failure.
+RECT = (100, 100, 500, 500)
+COUNT = 60
+
+
+def make(backend, seed=7, **kwargs):
+    return get_backend(backend)(COUNT, RECT, 30, seed=seed, **kwargs)
+
+
+def inside(state, rect, tolerance=1e-6):
+    x, y = state[0], state[1]
+    left, top, right, bottom = rect
+    return bool(((x >= left - tolerance) & (x <= right + tolerance) &
+                 (y >= top - tolerance) & (y <= bottom + tolerance)).all())
+
+
+def check_initial_state(backend):
+    physics = make(backend)
+    assert len(physics) == COUNT, f"expected {COUNT} molecules, got {len(physics)}"
+    state = physics.state()
+    assert all(len(array) == COUNT for array in state), "state arrays have the wrong length"
+    assert inside(state, RECT), "molecules start outside the container"
+
+
+def check_deterministic(backend):
+    a, b = make(backend, seed=3), make(backend, seed=3)
+    for _ in range(30):
+        a.step(1 / 60)
+        b.step(1 / 60)
+    for left, right in zip(a.state(), b.state()):
+        assert np.array_equal(left, right), "same seed gave different trajectories"
+
+
+def check_containment_with_piston(backend):
+    physics = make(backend)
+    for k in range(120):
+        # Compress, then expand again.
+        piston = 500 - 2 * k if k < 60 else 380 + 2 * (k - 60)
+        rect = (RECT[0], RECT[1], piston, RECT[3])
+        physics.set_container(rect)
+        physics.step(1 / 60)
+        assert inside(physics.state(), rect), f"molecules escaped at step {k}"
+
+
+def check_large_steps_with_fast_piston(backend):
+    # A hot gas, a piston slammed in and pulled out, and steps of 1/8 s.
+    physics = make(backend)
+    physics.set_temperature(400)
+    for k, piston in enumerate((450, 300, 160, 300, 500, 200)):
+        rect = (RECT[0], RECT[1], piston, RECT[3])
+        physics.set_container(rect)
+        physics.step(1 / 8)
+        assert inside(physics.state(), rect), f"molecules tunnelled out at step {k}"
+
+
+def check_temperature_sets_speed(backend):
+    physics = make(backend)
+    for temperature in (30, 200, 5):
+        physics.set_temperature(temperature)
+        physics.step(1 / 60)
+        _, _, vx, vy = physics.state()
+        rms = float(np.sqrt(np.mean(vx ** 2 + vy ** 2)))
+        expected = thermal_speed(temperature, physics.speed_factor)
+        assert abs(rms - expected) <= 0.01 * expected, \
+            f"RMS speed {rms:.3f} at T={temperature}, expected {expected:.3f}"
+
+
+def check_wall_impulse(backend):
+    physics = make(backend)
+    total = 0.0
+    for _ in range(120):
+        physics.step(1 / 60)
+        total += physics.take_wall_impulse()
+    assert total > 0, "no momentum was delivered to the walls"
+    assert physics.take_wall_impulse() == 0, "take_wall_impulse did not reset the total"
+
+
+def check_without_collisions(backend):
+    physics = make(backend, collisions=False)
+    for _ in range(30):
+        physics.step(1 / 60)
+    assert inside(physics.state(), RECT), "molecules escaped with collisions disabled"
+
+
+def check_grid_matches_brute_force(backend):
+    # The grid contact search must find exactly the pairs that testing every
+    # pair finds, so both runs stay identical, piston moves included.
+    # A small box, so that molecules meet often.
+    box = (100, 100, 200, 200)
+    grid, brute = (get_backend(backend)(COUNT, box, 30, seed=11, brute_force=brute_force)
+                   for brute_force in (False, True))
+    for k in range(40):
+        rect = (box[0], box[1], box[2] - k, box[3])
+        for physics in (grid, brute):
+            physics.set_container(rect)
+            physics.set_temperature(120)
+            physics.step(1 / 60)
+        for name, a, b in zip("x y vx vy".split(), grid.state(), brute.state()):
+            assert np.array_equal(a, b), f"{name} differs from the brute-force run after step {k}"
+
+
+def check_ensemble_fast_piston():
+    # Replicas of an ensemble share one contact search; a piston slammed in
+    # must not let molecules of neighbouring replicas meet in it.
+    replicas, count, dt = 4, 400, 1 / 60
+    physics = EnsembleBackend(replicas, count, RECT, 30, seed=5)
+    previous = RECT[2]
+    for piston in (470, 300, 160):
+        rect = (RECT[0], RECT[1], piston, RECT[3])
+        physics.set_container(rect)
+        i, j = physics.find_contacts()
+        assert (i // count == j // count).all(), \
+            f"{int((i // count != j // count).sum())} contacts cross replicas at piston {piston}"
+        x, y, vx, vy = (array.copy() for array in physics.state())
+        physics.step(dt)
+        assert inside(physics.state(), rect), f"molecules escaped at piston {piston}"
+        # Nothing moves further than its own flight plus a bounce off the
+        # piston (at up to twice its speed) and a contact separation.
+        bound = 2 * (previous - piston) + 2 * float(np.hypot(vx, vy).max()) * dt + 6
+        moved = float(np.hypot(physics.x - x, physics.y - y).max())
+        assert moved <= bound, f"a molecule jumped {moved:.1f} px at piston {piston}"
+        previous = piston
+
+
+def check_ensemble_grid_matches_brute_force():
+    replicas, count = 4, 100
+    grid = EnsembleBackend(replicas, count, RECT, 120, seed=9)
+    brute = EnsembleBackend(replicas, count, RECT, 120, seed=9, brute_force=True)
+    for piston in (500, 420, 250, 330):
+        rect = (RECT[0], RECT[1], piston, RECT[3])
+        for physics in (grid, brute):
+            physics.set_container(rect)
+        pairs, expected = grid.find_contacts(), brute.find_contacts()
+        assert all(np.array_equal(a, b) for a, b in zip(pairs, expected)), \
+            f"grid and brute-force contacts differ at piston {piston}"
+        grid.step(1 / 60)
+        brute.step(1 / 60)
+
+
+# Checks of the batched ensemble, run as the pseudo-backend "ensemble".
+ENSEMBLE_CHECKS = (check_ensemble_fast_piston, check_ensemble_grid_matches_brute_force)
+
+CHECKS = (
+    check_initial_state,
+    check_deterministic,
+    check_containment_with_piston,
+    check_large_steps_with_fast_piston,
+    check_temperature_sets_speed,
+    check_wall_impulse,
+    check_without_collisions,
+    check_grid_matches_brute_force,
+)
+
+
+def run_conformance(backend):
+    # Returns [(check name, error message or None)].
+    results = []
+    checks = ENSEMBLE_CHECKS if backend == "ensemble" else CHECKS
+    for check in checks:
+        try:
+            check() if backend == "ensemble" else check(backend)
+            results.append((check.__name__, None))
+        except AssertionError as error:
+            results.append((check.__name__, str(error) or "assertion failed"))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check physics backends against the shared contract.")
+    parser.add_argument("backends", nargs="*", default=available_backends() + ["ensemble"],
+                        help="backends to check, or 'ensemble' for the batched ensemble "
+                             "(default: all of them)")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for backend in args.backends:
+        for name, error in run_conformance(backend):
+            print(f"{backend:10} {name:32} {'FAIL: ' + error if error else 'ok'}")
+            failures += error is not None
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
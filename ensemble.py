@@ -0,0 +1,148 @@
+import numpy as np
+from backends import Backend
+from particles import ParticleSystem, brute_force_contacts, grid_contacts, sweep_axis, thermal_speed
+from simulation import CONTAINER, PressureGauge, Simulation, Snapshot
+
+
+# -------------------------------
+# Batched replicas (one particle store)
+# -------------------------------
+# M independent copies of the container share one ParticleSystem of M * N
+# molecules. Replica r owns slots r*N:(r+1)*N, so the (M, N) views below are
+# plain reshapes of the flat arrays and every step is still a handful of
+# array operations, whatever M is. All replicas see the same container rect
+# (piston) and target temperature; only their molecules differ.
+class EnsembleBackend(Backend):
+    name = "ensemble"
+
+    def __init__(self, replicas, num_molecules, container_rect, temperature, radius=3,
+                 speed_factor=0.5, seed=None, collisions=True, brute_force=False):
+        super().__init__(num_molecules, container_rect, temperature, radius, speed_factor,
+                         seed, collisions, brute_force)
+        self.replicas = replicas
+        self.particles = ParticleSystem(replicas * num_molecules, container_rect, temperature,
+                                        radius, speed_factor, seed)
+        p = self.particles
+        self.x, self.y, self.vx, self.vy, self.radius = (
+            array.reshape(replicas, num_molecules) for array in (p.x, p.y, p.vx, p.vy, p.radius))
+        self.wall_impulse = np.zeros(replicas)
+        self.wall_rect = None
+        self.set_temperature(temperature)
+
+    def __len__(self):
+        # Molecules per container, like every other backend.
+        return self.x.shape[1]
+
+    # --- Controls ---
+    def set_temperature(self, temperature):
+        # The isokinetic thermostat of ParticleSystem, applied to each replica
+        # on its own: one rescale factor per row.
+        self.temperature = temperature
+        speed = thermal_speed(temperature, self.speed_factor)
+        vx, vy = self.vx, self.vy
+        rms = np.sqrt(np.mean(vx * vx + vy * vy, axis=1))
+        scale = np.divide(speed, rms, out=np.ones_like(rms), where=rms > 0)
+        vx *= scale[:, None]
+        vy *= scale[:, None]
+
+    # --- Physics ---
+    def find_contacts(self):
+        # Lay the replicas side by side, two cells apart, and run one grid
+        # search over the lot. Molecules of different replicas are never
+        # within a contact distance, so no pair crosses replicas. Contacts
+        # are found before the walls are swept, so after a piston move
+        # molecules can still reach out to the previous piston position: the
+        # stride covers the furthest of the two pistons and the molecules.
+        # brute_force tests every pair of the same shifted layout.
+        left, top, right, bottom = self.container_rect
+        cell_size = 2 * float(self.particles.radius.max()) if self.x.size else 1.0
+        extent = max(right, (self.wall_rect or self.container_rect)[2])
+        if self.x.size:
+            extent = max(extent, float(self.x.max()))
+        stride = (extent - left) + 2 * cell_size
+        shifted = (self.x + stride * np.arange(self.replicas)[:, None]).ravel()
+        if self.brute_force:
+            return brute_force_contacts(shifted, self.particles.y, self.particles.radius)
+        wide_rect = (left, top, left + stride * self.replicas, bottom)
+        return grid_contacts(shifted, self.particles.y, self.particles.radius, wide_rect, cell_size)
+
+    def sweep_walls(self, dt):
+        # ParticleSystem.sweep_walls with the impulse summed per row.
+        left, top, right, bottom = self.container_rect
+        previous_rect = self.wall_rect or self.container_rect
+        r = self.radius
+        impulse = sweep_axis(self.x, self.vx, dt, left + r, previous_rect[2] - r, right - r)
+        impulse += sweep_axis(self.y, self.vy, dt, top + r, bottom - r, bottom - r)
+        self.wall_impulse += impulse.sum(axis=1)
+        self.wall_rect = tuple(self.container_rect)
+
+    def step(self, dt):
+        if self.collisions:
+            with self.profiler.phase("collisions"):
+                self.particles.resolve_contacts(*self.find_contacts())
+        with self.profiler.phase("molecule update"):
+            self.sweep_walls(dt)
+            self.set_temperature(self.temperature)
+
+    # --- State queries ---
+    def state(self):
+        # (M, N) arrays: one row per replica.
+        return self.x, self.y, self.vx, self.vy
+
+    def take_wall_impulse(self):
+        # One total per replica.
+        impulse, self.wall_impulse = self.wall_impulse, np.zeros(self.replicas)
+        return impulse
+
+
+# -------------------------------
+# Ensemble simulation
+# -------------------------------
+# The Simulation coupling (piston, temperature, K) driving an EnsembleBackend.
+# Gauges read per replica: measured_pressure and kinetic_energy() return one
+# value per replica and statistics() reduces them to means and variances.
+# snapshot() shows a single replica, so front ends, the physics thread and the
+# recorder work unchanged.
+class Ensemble(Simulation):
+    def __init__(self, replicas=16, num_molecules=80, temperature=30, piston=500, gamma=1.4,
+                 container=CONTAINER, speed_factor=0.5, seed=None, pressure_window=120,
+                 collisions=True, brute_force=False, shown=0):
+        if replicas < 1:
+            raise ValueError(f"an ensemble needs at least one replica, got {replicas}")
+        self.replicas = replicas
+        super().__init__(num_molecules, temperature, piston, gamma, physics="ensemble",
+                         container=container, speed_factor=speed_factor, seed=seed,
+                         pressure_window=pressure_window, collisions=collisions,
+                         brute_force=brute_force)
+        self.pressure_gauge = PressureGauge(pressure_window, (replicas,))
+        # Replica shown by snapshot().
+        self.shown = shown % replicas
+
+    def create_backend(self, physics, num_molecules, seed, collisions, brute_force):
+        return EnsembleBackend(self.replicas, num_molecules, self.container_rect, self.temperature,
+                               speed_factor=self.speed_factor, seed=seed, collisions=collisions,
+                               brute_force=brute_force)
+
+    def kinetic_energy(self):
+        _, _, vx, vy = self.backend.state()
+        return 0.5 * (vx ** 2 + vy ** 2).sum(axis=1)
+
+    def show(self, replica):
+        self.shown = replica % self.replicas
+
+    def show_next(self):
+        self.show(self.shown + 1)
+
+    def statistics(self):
+        # {gauge: (mean, variance)} across replicas; the variance is the
+        # unbiased sample variance (0 for a single replica).
+        ddof = 1 if self.replicas > 1 else 0
+        return {name: (float(values.mean()), float(values.var(ddof=ddof)))
+                for name, values in (("measured_pressure", self.measured_pressure),
+                                     ("kinetic_energy", self.kinetic_energy()))}
+
+    def snapshot(self):
+        x, y, vx, vy = (array[self.shown] for array in self.backend.state())
+        return Snapshot(self.step_count, self.time, x.copy(), y.copy(), vx.copy(), vy.copy(),
+                        np.hypot(vx, vy), self.piston, self.temperature, self.pressure,
+                        float(self.measured_pressure[self.shown]), self.volume)
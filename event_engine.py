@@ -0,0 +1,266 @@
+import heapq
+import math
+import numpy as np
+from particles import brute_force_contacts, grid_contacts
+
+# Wall identifiers used as the "partner" of particle-wall events.
+LEFT_WALL, TOP_WALL, BOTTOM_WALL, RIGHT_WALL = -1, -2, -3, -4
+
+
+# -------------------------------
+# Event-driven hard-sphere engine
+# -------------------------------
+# Instead of moving every molecule by a fixed dt and fixing up overlaps
+# afterwards, this engine predicts when the next particle-particle or
+# particle-wall collision happens, jumps straight to it and resolves it
+# exactly. Events live in a priority queue and are invalidated lazily: each
+# event remembers the collision counts of its particles when it was
+# predicted, and is dropped on pop if either particle has collided since.
+#
+# Each particle carries its own clock (last_time) so that only the particles
+# taking part in an event are advanced; everybody is synchronised once at the
+# end of the step. The engine works on a ParticleSystem in place and can be
+# swapped with the time-stepped ParticleSystem.update/collide pair.
+#
+# Like ParticleSystem.sweep_walls, the piston (right wall) moves steadily from
+# where the last step left it to its new position during a step. Its impact
+# times are predicted against the moving wall, and a bounce reflects the
+# velocity relative to it (v -> 2u - v).
+class EventDrivenEngine:
+    def __init__(self, particles):
+        self.particles = particles
+        # The particle store's velocity arrays, updated in place.
+        self.vx = particles.vx
+        self.vy = particles.vy
+        self.time = 0.0
+        self.collisions = 0
+        self.last_time = np.zeros(len(particles))
+        self.count = np.zeros(len(particles), dtype=np.int64)
+        self.queue = []
+        self.sequence = 0
+        # The piston's motion during the current step: x = start + velocity * (t - step_start).
+        self.step_start = 0.0
+        self.piston_start = None
+        self.piston_velocity = 0.0
+
+    # --- Prediction ---
+    def piston_position(self, t):
+        return self.piston_start + self.piston_velocity * (t - self.step_start)
+
+    def wall_times(self, index, container_rect):
+        # Time until each particle in `index` reaches the wall it is heading for.
+        left, top, _, bottom = container_rect
+        right, u = self.piston_position(self.time), self.piston_velocity
+        p = self.particles
+        x, y, r = p.x[index], p.y[index], p.radius[index]
+        vx, vy = self.vx[index], self.vy[index]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_left = np.maximum(np.where(vx < 0, (left + r - x) / vx, np.inf), 0.0)
+            # Only molecules gaining on the moving piston can reach it.
+            t_right = np.maximum(np.where(vx > u, (right - r - x) / (vx - u), np.inf), 0.0)
+            ty = np.where(vy < 0, (top + r - y) / vy,
+                          np.where(vy > 0, (bottom - r - y) / vy, np.inf))
+        right_first = t_right <= t_left
+        tx = np.where(right_first, t_right, t_left)
+        wall_x = np.where(right_first, RIGHT_WALL, LEFT_WALL)
+        wall_y = np.where(vy < 0, TOP_WALL, BOTTOM_WALL)
+        return tx, wall_x, np.maximum(ty, 0.0), wall_y
+
+    def pair_times(self, i, j):
+        # Time until particles i and j touch, assuming both are synchronised
+        # to self.time. Pairs that never meet get infinity.
+        p = self.particles
+        dx = p.x[j] - p.x[i]
+        dy = p.y[j] - p.y[i]
+        dvx = self.vx[j] - self.vx[i]
+        dvy = self.vy[j] - self.vy[i]
+        b = dx * dvx + dy * dvy
+        a = dvx * dvx + dvy * dvy
+        sigma = p.radius[i] + p.radius[j]
+        c = dx * dx + dy * dy - sigma * sigma
+        disc = b * b - a * c
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tau = -(b + np.sqrt(np.maximum(disc, 0.0))) / a
+        meets = (b < 0) & (disc >= 0) & (a > 0)
+        return np.where(meets, np.maximum(tau, 0.0), np.inf)
+
+    def push(self, times, i, j, t_end):
+        for t, a, b in zip(times.tolist(), i.tolist(), j.tolist()):
+            self.push_one(self.time + t, a, b, t_end)
+
+    def push_one(self, t, a, b, t_end):
+        if t <= t_end:
+            count_b = self.count[b] if b >= 0 else 0
+            self.sequence += 1
+            heapq.heappush(self.queue, (t, self.sequence, a, b, self.count[a], count_b))
+
+    # The per-event path below touches one particle and its few neighbours at
+    # a time, so it works on plain floats with `math`: NumPy calls on
+    # one-element arrays cost far more than the arithmetic they do.
+    def predict(self, i, container_rect, t_end):
+        # Re-predict every event of particle i (already synchronised to self.time).
+        left, top, _, bottom = container_rect
+        p = self.particles
+        now = self.time
+        right, u = self.piston_position(now), self.piston_velocity
+        x, y, r = float(p.x[i]), float(p.y[i]), float(p.radius[i])
+        vx, vy = float(self.vx[i]), float(self.vy[i])
+        t_left = max((left + r - x) / vx, 0.0) if vx < 0 else math.inf
+        # Only molecules gaining on the moving piston can reach it.
+        t_right = max((right - r - x) / (vx - u), 0.0) if vx > u else math.inf
+        if t_right <= t_left:
+            self.push_one(now + t_right, i, RIGHT_WALL, t_end)
+        else:
+            self.push_one(now + t_left, i, LEFT_WALL, t_end)
+        if vy < 0:
+            self.push_one(now + max((top + r - y) / vy, 0.0), i, TOP_WALL, t_end)
+        elif vy > 0:
+            self.push_one(now + max((bottom - r - y) / vy, 0.0), i, BOTTOM_WALL, t_end)
+
+        for j in self.neighbours[self.neighbour_start[i]:self.neighbour_start[i + 1]].tolist():
+            self.synchronise_one(j)
+            # Same as pair_times, for one pair.
+            dx = float(p.x[j]) - x
+            dy = float(p.y[j]) - y
+            dvx = float(self.vx[j]) - vx
+            dvy = float(self.vy[j]) - vy
+            b = dx * dvx + dy * dvy
+            if b >= 0:
+                continue
+            a = dvx * dvx + dvy * dvy
+            sigma = r + float(p.radius[j])
+            disc = b * b - a * (dx * dx + dy * dy - sigma * sigma)
+            if disc < 0 or a <= 0:
+                continue
+            self.push_one(now + max(-(b + math.sqrt(disc)) / a, 0.0), i, j, t_end)
+
+    def schedule(self, container_rect, t_end):
+        # Rebuild the whole queue for the interval [self.time, t_end].
+        p = self.particles
+        self.synchronise(np.arange(len(p)))
+        self.queue = []
+        speeds = np.hypot(self.vx, self.vy)
+        self.max_speed = float(speeds.max()) if len(p) else 0.0
+        # Only pairs that can close the gap within the interval are candidates.
+        reach = self.max_speed * (t_end - self.time)
+        cell_size = 2 * (float(p.radius.max()) + reach) if len(p) else 1.0
+        if p.brute_force:
+            a, b = brute_force_contacts(p.x, p.y, p.radius + reach)
+        else:
+            # The grid must cover the piston at both ends of its travel.
+            left, top, right, bottom = container_rect
+            grid_rect = (left, top, max(right, self.piston_start), bottom)
+            a, b = grid_contacts(p.x, p.y, p.radius + reach, grid_rect, cell_size)
+
+        # Neighbour lists in compressed (CSR) form, both directions.
+        owner = np.concatenate([a, b])
+        other = np.concatenate([b, a])
+        order = np.argsort(owner, kind="stable")
+        self.neighbours = other[order]
+        self.neighbour_start = np.searchsorted(owner[order], np.arange(len(p) + 1))
+
+        index = np.arange(len(p))
+        tx, wall_x, ty, wall_y = self.wall_times(index, container_rect)
+        times = self.pair_times(a, b)
+        for t, i, j in ((tx, index, wall_x), (ty, index, wall_y), (times, a, b)):
+            soon = self.time + t <= t_end
+            self.push(t[soon], i[soon], j[soon], t_end)
+
+    # --- Motion ---
+    def synchronise(self, index):
+        p = self.particles
+        elapsed = self.time - self.last_time[index]
+        p.x[index] += self.vx[index] * elapsed
+        p.y[index] += self.vy[index] * elapsed
+        self.last_time[index] = self.time
+
+    def synchronise_one(self, k):
+        elapsed = self.time - self.last_time[k]
+        if elapsed:
+            p = self.particles
+            p.x[k] += self.vx[k] * elapsed
+            p.y[k] += self.vy[k] * elapsed
+            self.last_time[k] = self.time
+
+    def contain(self, container_rect):
+        # Put back molecules found outside the container at the start of a
+        # step (e.g. after a restored state), heading inwards. Piston moves
+        # never leave any outside: they are swept during the step.
+        left, top, right, bottom = container_rect
+        p = self.particles
+        r = p.radius
+        hit = p.x + r > right
+        p.x[hit] = right - r[hit]
+        self.vx[hit] = -np.abs(self.vx[hit])
+        hit = p.x - r < left
+        p.x[hit] = left + r[hit]
+        self.vx[hit] = np.abs(self.vx[hit])
+        hit = p.y - r < top
+        p.y[hit] = top + r[hit]
+        self.vy[hit] = np.abs(self.vy[hit])
+        hit = p.y + r > bottom
+        p.y[hit] = bottom - r[hit]
+        self.vy[hit] = -np.abs(self.vy[hit])
+
+    def resolve(self, i, j):
+        p = self.particles
+        if j < 0:
+            if j == RIGHT_WALL:
+                # Reflect relative to the moving piston.
+                bounced = 2 * self.piston_velocity - self.vx[i]
+                p.wall_impulse += abs(bounced - self.vx[i])
+                self.vx[i] = bounced
+            elif j == LEFT_WALL:
+                p.wall_impulse += 2 * abs(self.vx[i])
+                self.vx[i] = -self.vx[i]
+            else:
+                p.wall_impulse += 2 * abs(self.vy[i])
+                self.vy[i] = -self.vy[i]
+            self.count[i] += 1
+            return
+        # Equal-mass elastic collision: exchange the normal velocity components.
+        dx = p.x[j] - p.x[i]
+        dy = p.y[j] - p.y[i]
+        distance = math.hypot(dx, dy) or 1.0
+        nx, ny = dx / distance, dy / distance
+        impulse = (self.vx[j] - self.vx[i]) * nx + (self.vy[j] - self.vy[i]) * ny
+        self.vx[i] += impulse * nx
+        self.vy[i] += impulse * ny
+        self.vx[j] -= impulse * nx
+        self.vy[j] -= impulse * ny
+        self.count[i] += 1
+        self.count[j] += 1
+
+    def step(self, dt, temperature, container_rect):
+        p = self.particles
+        # Temperature changes rescale every velocity by the same factor.
+        p.set_temperature(temperature)
+
+        # The piston travels from where the last step left it to container_rect.
+        left, top, right, bottom = container_rect
+        self.piston_start = (p.wall_rect or container_rect)[2]
+        self.piston_velocity = (right - self.piston_start) / dt if dt > 0 else 0.0
+        self.step_start = self.time
+        self.contain((left, top, self.piston_start, bottom))
+        t_end = self.time + dt
+        self.schedule(container_rect, t_end)
+        while self.queue and self.queue[0][0] <= t_end:
+            t, _, i, j, count_i, count_j = heapq.heappop(self.queue)
+            if self.count[i] != count_i or (j >= 0 and self.count[j] != count_j):
+                continue  # Stale: a partner has collided since the prediction.
+            self.time = t
+            partners = [i] if j < 0 else [i, j]
+            for k in partners:
+                self.synchronise_one(k)
+            self.resolve(i, j)
+            self.collisions += 1
+            if max(math.hypot(self.vx[k], self.vy[k]) for k in partners) > self.max_speed:
+                # Faster than the candidate search assumed: rebuild from here.
+                self.schedule(container_rect, t_end)
+                continue
+            for k in partners:
+                self.predict(k, container_rect, t_end)
+
+        self.time = t_end
+        self.synchronise(np.arange(len(p)))
+        p.wall_rect = tuple(container_rect)
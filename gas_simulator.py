@@ -1,127 +1,409 @@
 import pygame
-import random
 import math
-import pygame.gfxdraw
-
-class Slider:
-    def __init__(self, x, y, width, height, min_val, max_val, initial_val):
-        self.x = x
-        self.y = y
-        self.width = width
-        self.height = height
-        self.min_val = min_val
-        self.max_val = max_val
-        self.value = initial_val
-        self.handle_radius = height // 2
-        self.handle_x = self.value_to_pos(self.value)
-        self.dragging = False
-
-    def value_to_pos(self, value):
-        ratio = (value - self.min_val) / (self.max_val - self.min_val)
-        return self.x + int(ratio * self.width)
-
-    def pos_to_value(self, pos):
-        ratio = (pos - self.x) / self.width
-        value = self.min_val + ratio * (self.max_val - self.min_val)
-        return max(self.min_val, min(self.max_val, value))
-
-    def handle_event(self, event):
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            mx, my = event.pos
-            if math.hypot(mx - self.handle_x, my - (self.y + self.height//2)) <= self.handle_radius:
-                self.dragging = True
-        elif event.type == pygame.MOUSEBUTTONUP:
-            self.dragging = False
-        elif event.type == pygame.MOUSEMOTION and self.dragging:
-            mx, _ = event.pos
-            mx = max(self.x, min(self.x + self.width, mx))
-            self.handle_x = mx
-            self.value = self.pos_to_value(mx)
+import functools
+import argparse
+from backends import available_backends
+from simulation import Simulation, kinetic_pressure_scale
+from ensemble import Ensemble
+from widgets import Slider
+from recorder import Trajectory, TrajectoryRecorder
+from checkpoint import load_checkpoint, save_checkpoint
+from sprites import SpriteAtlas
+from splat import RENDER_MODES, DensitySplat
+from physics_thread import PhysicsWorker
+from profiler import DISABLED, FrameProfiler
+from particles import thermal_speed
+from governor import QualityGovernor, quality_levels
+from stats import StatisticsEngine
+from graphs import GraphPanel
+
+# Colors
+BACKGROUND_COLOR = (245, 245, 250)
+CONTAINER_COLOR = (144, 238, 144)  # LightGreen
+PISTON_COLOR = (150, 160, 180)
+ACCENT_COLOR = (50, 80, 150)
+HOT_COLOR = (255, 80, 80)
+COLD_COLOR = (80, 150, 255)
+
+# Above this many molecules, "auto" rendering starts with the density heatmap.
+SPRITE_LIMIT = 5000
+
 
 # -------------------------------
-# Enhanced Molecule Class with Temperature Coloring
+# Frame Renderer (graphical enhancements)
 # -------------------------------
-class Molecule:
-    def __init__(self, container_rect, temperature):
-        self.container_rect = container_rect
-        self.x = random.uniform(container_rect[0] + 5, container_rect[2] - 5)
-        self.y = random.uniform(container_rect[1] + 5, container_rect[3] - 5)
-        angle = random.uniform(0, 2 * math.pi)
-        self.vx = math.cos(angle)
-        self.vy = math.sin(angle)
-        self.speed = 0.5 * temperature
-        self.radius = 3
-
-    def check_collision(self, other):
-        dx = self.x - other.x
-        dy = self.y - other.y
-        distance_sq = dx*dx + dy*dy
-        min_distance = self.radius + other.radius
-        if distance_sq < min_distance*min_distance:
-            # Simple elastic collision response (can be improved for accuracy)
-            self.vx, other.vx = other.vx, self.vx
-            self.vy, other.vy = other.vy, self.vy
-            # Separate molecules slightly to avoid sticking
-            overlap = min_distance - math.sqrt(distance_sq)
-            self.x += overlap * (self.x - other.x) / math.sqrt(distance_sq) if distance_sq != 0 else overlap / 2
-            self.y += overlap * (self.y - other.y) / math.sqrt(distance_sq) if distance_sq != 0 else overlap / 2
-            other.x -= overlap * (self.x - other.x) / math.sqrt(distance_sq) if distance_sq != 0 else overlap / 2
-            other.y -= overlap * (self.y - other.y) / math.sqrt(distance_sq) if distance_sq != 0 else overlap / 2
-
-
-    def update(self, dt, temperature, container_rect):
-        self.speed = 0.5 * temperature
-        self.x += self.vx * self.speed * dt
-        self.y += self.vy * self.speed * dt
-
-        left, top, right, bottom = container_rect
-        if self.x - self.radius < left:
-            self.x = left + self.radius
-            self.vx = -self.vx
-        if self.y - self.radius < top:
-            self.y = top + self.radius
-            self.vy = -self.vy
-        if self.y + self.radius > bottom:
-            self.y = bottom - self.radius
-            self.vy = -self.vy
-        if self.x + self.radius > right:
-            self.x = right - self.radius
-            self.vx = -self.vx
-
-        norm = math.sqrt(self.vx**2 + self.vy**2)
-        if norm:
-            self.vx /= norm
-            self.vy /= norm
-
-    def draw(self, surface, color=None):
-        # Color will be handled in main drawing loop
-        pygame.draw.circle(surface, color, (int(self.x), int(self.y)), self.radius)
+# Owns every pre-built surface and font and draws one complete frame from a
+# Snapshot, so the same drawing code serves live runs, replays and offscreen
+# rendering (benchmarks).
+class Renderer:
+    def __init__(self, screen_size=(1000, 700), container=(100, 100, 500), molecule_radius=3,
+                 max_temperature=400, profiler=DISABLED, render_mode="sprites", speed_factor=0.5):
+        screen_width, screen_height = screen_size
+        self.container_left, self.container_top, self.container_bottom = container
+        container_height = self.container_bottom - self.container_top
+        self.container_height = container_height
+        # Molecule colour saturates at the speed of the hottest slider setting.
+        self.max_speed = thermal_speed(max_temperature, speed_factor)
+        # The gauge reads the measured wall pressure in kPa-like display units.
+        self.pressure_scale = kinetic_pressure_scale(speed_factor)
+        self.font = pygame.font.SysFont("Arial", 18, bold=True)
+        self.large_font = pygame.font.SysFont("Arial", 24, bold=True)
+        self.hud_font = pygame.font.SysFont("Arial", 14, bold=True)
+        self.profiler = profiler
+
+        # Gradient background surface
+        self.background = pygame.Surface((screen_width, screen_height))
+        for y in range(screen_height):
+            pygame.draw.line(self.background, (230 - y//30, 235 - y//30, 255), (0, y), (screen_width, y))
+
+        # Glass effect for container
+        self.container_glass = pygame.Surface((1, container_height), pygame.SRCALPHA) # Initial width set to 1, will be updated dynamically
+        pygame.draw.rect(self.container_glass, (255, 255, 255, 50), (0, 0, 1, container_height), border_radius=10) # Initial width set to 1
+        for i in range(5):
+            pygame.draw.line(self.container_glass, (255, 255, 255, 100),
+                            (i*80, 0), (i*80, container_height), 2)
+
+        # Piston appearance
+        self.piston_texture = pygame.Surface((20, container_height), pygame.SRCALPHA)
+        pygame.draw.rect(self.piston_texture, (180, 190, 200), (0, 0, 20, container_height), border_radius=3)
+        pygame.draw.rect(self.piston_texture, (200, 210, 220), (2, 2, 16, container_height-4), border_radius=2)
+
+        # Particle trail surfaces
+        self.trail_surface = pygame.Surface((screen_width, screen_height), pygame.SRCALPHA)
+        self.trail_surface.set_alpha(50)  # Semi-transparent trails
+        # Pre-rendered molecule and trail glyphs, one per colour bucket
+        self.sprites = SpriteAtlas(COLD_COLOR, HOT_COLOR, molecule_radius)
+        # Point splats and heatmaps for very large molecule counts
+        self.splat = DensitySplat(COLD_COLOR, HOT_COLOR)
+        self.render_mode = render_mode
+        # Quality knobs, lowered by the QualityGovernor on slow machines:
+        # trails on/off and drawing only every stride-th molecule.
+        self.trails = True
+        self.stride = 1
+
+        # Gauges setup: the panel, dial face and tick marks never change, so
+        # they are drawn once onto one surface.
+        self.gauge_bg = pygame.Surface((300, 210), pygame.SRCALPHA)
+        pygame.draw.rect(self.gauge_bg, (255, 255, 255, 200), (0, 0, 300, 190), border_radius=15)
+        pygame.draw.rect(self.gauge_bg, (0, 0, 0, 30), (0, 0, 300, 190), 2, border_radius=15)
+        self.gauge_rect = pygame.Rect(650, 50, 300, 210)
+        self.gauge_center = (710, 110)
+        self.gauge_radius = 40
+        self.gauge_panel = self.gauge_bg.copy()
+        dial_x = self.gauge_center[0] - self.gauge_rect.x
+        dial_y = self.gauge_center[1] - self.gauge_rect.y
+        gauge_radius = self.gauge_radius
+        # Background circle for gauge
+        pygame.draw.circle(self.gauge_panel, (230, 230, 230), (dial_x, dial_y), gauge_radius)
+        pygame.draw.circle(self.gauge_panel, ACCENT_COLOR, (dial_x, dial_y), gauge_radius, 2)
+        # Tick marks
+        for angle_deg in range(220, -61, -40): # More ticks for clarity
+            angle_rad = math.radians(angle_deg)
+            tick_length = 8
+            tick_start_x = dial_x + (gauge_radius - tick_length) * math.cos(angle_rad)
+            tick_start_y = dial_y + (gauge_radius - tick_length) * math.sin(angle_rad)
+            tick_end_x = dial_x + gauge_radius * math.cos(angle_rad)
+            tick_end_y = dial_y + gauge_radius * math.sin(angle_rad)
+            pygame.draw.line(self.gauge_panel, ACCENT_COLOR, (tick_start_x, tick_start_y), (tick_end_x, tick_end_y), 2)
+
+        # Live P, T, V time series and P-V diagram (toggle with G).
+        # The column right of the furthest piston position (800) stays clear.
+        self.graphs = GraphPanel((830, 270, 162, 275), self.hud_font,
+                                 (ACCENT_COLOR, HOT_COLOR, COLD_COLOR))
+
+        # Shadow under the piston
+        self.piston_shadow = pygame.Surface((20, container_height), pygame.SRCALPHA)
+        self.piston_shadow.fill((0, 0, 0, 30))
+        # Container fill for the current piston position, rebuilt when it moves.
+        self.container_surface = None
+
+        # Text surfaces memoized by (font, text, colour): gauge values and
+        # labels are only rendered again when they change.
+        self.render_text = functools.lru_cache(maxsize=256)(self._render_text)
+
+        # Dirty-rectangle bookkeeping (see draw()).
+        self.target = None
+        self.regions = {}
+        self.state = None
+
+    def _render_text(self, font, text, color):
+        return font.render(text, True, color)
+
+    def set_quality(self, quality):
+        self.trails = quality.trails
+        self.stride = quality.stride
+        self.sprites.set_antialias(quality.antialias)
+
+    def invalidate(self):
+        # Repaint (and report) the whole screen on the next draw.
+        self.target = None
+
+    def container_layer(self, piston_pos):
+        # Container fill and border for the current piston width, cached.
+        width = int(piston_pos - self.container_left)
+        if self.container_surface is None or self.container_surface.get_width() != width:
+            self.container_surface = pygame.Surface((width, self.container_height), pygame.SRCALPHA)
+            self.container_surface.fill(CONTAINER_COLOR + (50,))
+            pygame.draw.rect(self.container_surface, (255, 255, 255, 30),
+                           (0, 0, width, self.container_height), 3)
+        return self.container_surface
+
+    def draw_slider(self, screen, slider, label):
+        # Track
+        pygame.draw.rect(screen, (220, 220, 230),
+                       (slider.x, slider.y + slider.height//2 - 8, slider.width, 16),
+                       border_radius=8)
+        # Handle
+        pygame.draw.circle(screen, ACCENT_COLOR, (slider.handle_x, slider.y + slider.height//2),
+                         slider.handle_radius + 2)
+        pygame.draw.circle(screen, (255, 255, 255), (slider.handle_x, slider.y + slider.height//2),
+                         slider.handle_radius - 2)
+        # Label
+        text = self.render_text(self.font, label, (50, 50, 70))
+        screen.blit(text, (slider.x, slider.y - 30))
+
+    def slider_rect(self, slider, label):
+        text = self.render_text(self.font, label, (50, 50, 70))
+        reach = max(slider.handle_radius + 3, 9)
+        rect = pygame.Rect(slider.x - reach, slider.y + slider.height // 2 - reach,
+                           slider.width + 2 * reach, 2 * reach)
+        return rect.union(text.get_rect(topleft=(slider.x, slider.y - 30)))
+
+    def draw_container(self, screen, state, area):
+        container_left, container_top = self.container_left, self.container_top
+        container_bottom, container_height = self.container_bottom, self.container_height
+        piston_pos = state.piston
+        phase = self.profiler.phase
+        if self.stride > 1:
+            # Show a subset of the molecules.
+            s = self.stride
+            state = state._replace(x=state.x[::s], y=state.y[::s], speed=state.speed[::s])
+
+        with phase("draw container"):
+            # Draw container
+            screen.blit(self.container_layer(piston_pos), (container_left, container_top))
+
+            # Draw glass effect
+            screen.blit(self.container_glass, (container_left, container_top),
+                      (0, 0, piston_pos - container_left, container_height))
+
+            # Draw piston
+            screen.blit(self.piston_texture, (piston_pos - 10, container_top))
+            pygame.draw.line(screen, (200, 210, 220), (piston_pos, container_top),
+                            (piston_pos, container_bottom), 4)
+
+        if self.render_mode == "sprites":
+            # Draw molecules with trails
+            trail_surface = self.trail_surface if self.trails else None
+            with phase("draw molecules"):
+                if trail_surface is not None:
+                    trail_surface.fill((0, 0, 0, 0), area)  # Clear trail surface
+                # Color based on speed (temperature)
+                speed_ratio = state.speed / self.max_speed
+                self.sprites.draw(screen, trail_surface, state.x.astype(int), state.y.astype(int),
+                                  speed_ratio)
+            if trail_surface is not None:
+                with phase("trail compositing"):
+                    screen.blit(trail_surface, area, area)
+        else:
+            # Write molecules straight into a pixel buffer (points or heatmap)
+            with phase("draw molecules"):
+                self.splat.draw(screen, self.render_mode, state,
+                                (container_left, container_top, piston_pos, container_bottom),
+                                self.max_speed)
+
+    def gauge_pressure(self, state):
+        # Windowed mechanical pressure from wall collisions, in display units.
+        return state.measured_pressure * self.pressure_scale
+
+    def gauge_texts(self, state):
+        return (
+            (self.large_font, f"{self.gauge_pressure(state):.1f} kPa", ACCENT_COLOR, (760, 80)),
+            (self.large_font, f"{state.temperature:.0f} K", HOT_COLOR, (760, 120)),
+            (self.large_font, f"V: {state.volume//1000:.1f} L", COLD_COLOR, (760, 160)),
+            # The ideal-gas value nT/V for comparison.
+            (self.font, f"Ideal: {state.pressure:.1f} kPa", ACCENT_COLOR, (760, 200)),
+        )
+
+    def needle_end(self, state):
+        # Pressure needle - more pronounced needle
+        pressure_angle = 220 - (self.gauge_pressure(state)/150)*280
+        needle_length = self.gauge_radius - 5
+        gauge_center_x, gauge_center_y = self.gauge_center
+        return (gauge_center_x + needle_length * math.cos(math.radians(pressure_angle)),
+                gauge_center_y + needle_length * math.sin(math.radians(pressure_angle)))
+
+    def draw_gauges(self, screen, state):
+        with self.profiler.phase("draw gauges"):
+            screen.blit(self.gauge_panel, self.gauge_rect)
+            pygame.draw.line(screen, HOT_COLOR, self.gauge_center, self.needle_end(state), 3)
+            pygame.draw.circle(screen, HOT_COLOR, self.gauge_center, 5) # Needle base
+
+        with self.profiler.phase("text rendering"):
+            for font, text, color, position in self.gauge_texts(state):
+                screen.blit(self.render_text(font, text, color), position)
+
+    def footer_texts(self, caption):
+        texts = [(f"RENDER: {self.render_mode.upper()} (M)", self.container_left)]
+        if caption:
+            texts.append((caption, self.container_left + 250))
+        return texts
+
+    def footer_rect(self, texts):
+        rect = pygame.Rect(self.container_left, self.container_bottom + 10, 0, 0)
+        for text, x in texts:
+            surface = self.render_text(self.font, text, (50, 50, 70))
+            rect.union_ip(surface.get_rect(topleft=(x, self.container_bottom + 10)))
+        return rect
+
+    def draw_footer(self, screen, texts):
+        with self.profiler.phase("text rendering"):
+            for text, x in texts:
+                screen.blit(self.render_text(self.font, text, (50, 50, 70)), (x, self.container_bottom + 10))
+
+    def draw(self, screen, state, sliders=(), caption=None, stats=None):
+        # Draws one frame and returns the list of rectangles that changed, for
+        # pygame.display.update. `stats` is a StatisticsEngine whose graphs are
+        # drawn over the right-hand side, or None to hide them.
+        #
+        # The frame is a stack of regions (container, sliders, gauges, footer
+        # text, graphs, profiler HUD), each with a key that changes whenever its
+        # content does. Only regions whose key changed are repainted: the
+        # cached background is restored under them, over their old and new
+        # extent, and they are drawn again. A region that overlaps a repainted
+        # one is repainted too, so the stacking order is kept.
+        container_left, container_top = self.container_left, self.container_top
+        piston_pos = state.piston
+        regions = []
+
+        # The molecules move every frame; a replay paused on one frame passes
+        # the same snapshot again.
+        container_rect = pygame.Rect(container_left - 4, container_top - 4,
+                                     piston_pos + 18 - container_left, self.container_height + 8)
+        container_key = (piston_pos, self.render_mode, self.trails, self.stride, self.sprites.antialias)
+        regions.append(("container", container_key, container_rect,
+                        lambda: self.draw_container(screen, state, areas["container"])))
+
+        for index, (slider, label) in enumerate(sliders):
+            regions.append((("slider", index), (slider.handle_x, label), self.slider_rect(slider, label),
+                            lambda slider=slider, label=label: self.draw_slider(screen, slider, label)))
+
+        texts = self.gauge_texts(state)
+        needle = tuple(map(int, self.needle_end(state)))
+        regions.append(("gauges", (needle, tuple(text for _, text, _, _ in texts)), self.gauge_rect,
+                        lambda: self.draw_gauges(screen, state)))
+
+        footer = self.footer_texts(caption)
+        regions.append(("footer", tuple(footer), self.footer_rect(footer),
+                        lambda: self.draw_footer(screen, footer)))
+
+        # Add subtle shadow under piston
+        shadow_position = (piston_pos - 5, container_top + 5)
+        regions.append(("shadow", piston_pos, self.piston_shadow.get_rect(topleft=shadow_position),
+                        lambda: screen.blit(self.piston_shadow, shadow_position)))
+
+        if stats is not None:
+            # Redrawn once per new sample, not per frame.
+            regions.append(("graphs", (stats.count, self.graphs.level), self.graphs.rect,
+                            lambda: self.graphs.draw(screen, stats)))
+        else:
+            regions.append(("graphs", None, pygame.Rect(self.graphs.rect.topleft, (0, 0)), lambda: None))
+
+        if self.profiler.enabled:
+            rows = self.profiler_rows()
+            # The HUD changes every frame while it is shown.
+            regions.append(("hud", object(), self.hud_rect(rows),
+                            lambda: self.draw_profiler_hud(screen, rows)))
+        else:
+            regions.append(("hud", None, pygame.Rect(10, 10, 0, 0), lambda: None))
+
+        full = self.target is not screen
+        previous = {} if full else self.regions
+        areas = {}
+        dirty = set()
+        for name, key, rect, _ in regions:
+            old = previous.get(name)
+            areas[name] = rect.union(old[1]) if old else rect
+            if old is None or old[0] != key or (name == "container" and state is not self.state):
+                dirty.add(name)
+        # Repaint everything that overlaps a repainted region.
+        grown = True
+        while grown:
+            grown = False
+            for name, _, _, _ in regions:
+                if name not in dirty and areas[name].collidelist([areas[d] for d in dirty]) != -1:
+                    dirty.add(name)
+                    grown = True
+
+        self.target = screen
+        self.regions = {name: (key, rect) for name, key, rect, _ in regions}
+        self.state = state
+        with self.profiler.phase("draw background"):
+            if full:
+                screen.blit(self.background, (0, 0))
+            else:
+                for name in dirty:
+                    screen.blit(self.background, areas[name], areas[name])
+        for name, _, _, draw in regions:
+            if name in dirty:
+                draw()
+
+        if full:
+            return [screen.get_rect()]
+        return [areas[name] for name, _, _, _ in regions if name in dirty]
+
+    def profiler_rows(self):
+        rows = [("phase", "p50 ms", "p95 ms")]
+        rows += [(name, f"{p50:.2f}", f"{p95:.2f}") for name, (p50, p95) in self.profiler.stats().items()]
+        return rows
+
+    def hud_rect(self, rows):
+        return pygame.Rect(10, 10, 300, self.hud_font.get_linesize() * len(rows) + 10)
+
+    def draw_profiler_hud(self, screen, rows):
+        # Rolling p50/p95 per phase in the top-left corner (toggle with F3).
+        line_height = self.hud_font.get_linesize()
+        panel = pygame.Surface((300, line_height * len(rows) + 10), pygame.SRCALPHA)
+        panel.fill((20, 20, 30, 190))
+        for row, (name, p50, p95) in enumerate(rows):
+            y = 5 + row * line_height
+            panel.blit(self.hud_font.render(name, True, (230, 240, 255)), (8, y))
+            # Right-align the numeric columns.
+            for text, right in ((p50, 220), (p95, 292)):
+                surface = self.hud_font.render(text, True, (230, 240, 255))
+                panel.blit(surface, (right - surface.get_width(), y))
+        screen.blit(panel, (10, 10))
+
 
 # -------------------------------
-# Main Simulation Function (with graphical enhancements)
+# Main Simulation Function
 # -------------------------------
-def main():
+def main(physics="stepper", seed=None, record=None, replay=None, threaded=True,
+         physics_dt=1 / 120, substeps=1, profile=False, trace=None, num_molecules=80,
+         render="auto", load=None, checkpoint="simulation.ckpt", replicas=1, replica=0,
+         target_fps=60, graphs=False):
     pygame.init()
     screen_width, screen_height = 1000, 700
     screen = pygame.display.set_mode((screen_width, screen_height))
     pygame.display.set_caption("Gas Laws Simulation - Enhanced")
     clock = pygame.time.Clock()
-    font = pygame.font.SysFont("Arial", 18, bold=True)
-    large_font = pygame.font.SysFont("Arial", 24, bold=True)
-    
-    # Colors
-    BACKGROUND_COLOR = (245, 245, 250)
-    CONTAINER_COLOR = (144, 238, 144)  # LightGreen
-    PISTON_COLOR = (150, 160, 180)
-    ACCENT_COLOR = (50, 80, 150)
-    HOT_COLOR = (255, 80, 80)
-    COLD_COLOR = (80, 150, 255)
+    # Per-phase timers: F3 toggles the overlay, F5 starts and then writes a
+    # Chrome trace.
+    profiler = FrameProfiler(enabled=profile or bool(trace), trace=bool(trace))
+    trace_path = trace or "frame_trace.json"
+    # F6 saves the running simulation to `checkpoint`; `load` starts from one.
+    sim = load_checkpoint(load) if load and not replay else None
+    # With replicas > 1 the window shows one replica of a batched ensemble
+    # (TAB cycles through them).
+    ensemble = replicas > 1 and sim is None and not replay
 
     # Improved container dimensions
     container_left = 100
     container_top = 100
     container_bottom = 500
-    container_height = container_bottom - container_top
+    if sim is not None:
+        container_left, container_top, container_bottom = (
+            sim.container_left, sim.container_top, sim.container_bottom)
 
     # Create sliders with new positions
     piston_slider = Slider(x=100, y=580, width=400, height=25,
@@ -129,200 +411,253 @@ def main():
     temp_slider = Slider(x=550, y=580, width=400, height=25,
                        min_val=1, max_val=400, initial_val=30)
 
-    # Set the coupling parameters.
-    # Here we use an adiabatic-like relation: T * L^(gamma-1) = K,
-    # where L = piston_slider.value - container_left (the effective length).
+    # The physics and the adiabatic-like coupling T * L^(gamma-1) = K live in
+    # the pygame-free Simulation core (simulation.py).
     gamma = 1.4  # Heat capacity ratio.
-    L0 = piston_slider.value - container_left
-    T0 = temp_slider.value
-    K = T0 * (L0 ** (gamma - 1))  # Energy state constant.
-
-    num_molecules = 80
-    container_rect = (container_left, container_top, piston_slider.value, container_bottom)
-    molecules = [Molecule(container_rect, temp_slider.value) for _ in range(num_molecules)]
-
-    # Gradient background surface
-    background = pygame.Surface((screen_width, screen_height))
-    for y in range(screen_height):
-        alpha = int(255 * (1 - y/screen_height))
-        pygame.draw.line(background, (230 - y//30, 235 - y//30, 255), (0, y), (screen_width, y))
-
-    # Glass effect for container
-    container_glass = pygame.Surface((1, container_height), pygame.SRCALPHA) # Initial width set to 1, will be updated dynamically
-    pygame.draw.rect(container_glass, (255, 255, 255, 50), (0, 0, 1, container_height), border_radius=10) # Initial width set to 1
-    for i in range(5):
-        pygame.draw.line(container_glass, (255, 255, 255, 100),
-                        (i*80, 0), (i*80, container_height), 2)
-
-    # Piston appearance
-    piston_texture = pygame.Surface((20, container_height), pygame.SRCALPHA)
-    pygame.draw.rect(piston_texture, (180, 190, 200), (0, 0, 20, container_height), border_radius=3)
-    pygame.draw.rect(piston_texture, (200, 210, 220), (2, 2, 16, container_height-4), border_radius=2)
-    
-    # Particle trail surfaces
-    trail_surface = pygame.Surface((screen_width, screen_height), pygame.SRCALPHA)
-    trail_surface.set_alpha(50)  # Semi-transparent trails
-
-    # Gauges setup
-    gauge_bg = pygame.Surface((300, 210), pygame.SRCALPHA)
-    pygame.draw.rect(gauge_bg, (255, 255, 255, 200), (0, 0, 300, 150), border_radius=15)
-    pygame.draw.rect(gauge_bg, (0, 0, 0, 30), (0, 0, 300, 150), 2, border_radius=15)
+    # Rolling means, variances and downsampled history of P, T, V and KE, fed
+    # once per physics step; G shows the graph panel and Z zooms its time axis.
+    stats = StatisticsEngine()
+    show_graphs = graphs
+    molecule_radius = 3
+    recorder = trajectory = worker = None
+    if replay:
+        # Replay mode: frames come from a memory-mapped recording, no physics runs.
+        trajectory = Trajectory(replay)
+        if not len(trajectory):
+            raise ValueError(f"{replay} contains no frames")
+        molecule_radius = int(trajectory.radius)
+        num_molecules = trajectory.num_molecules
+        frame_index = 0
+        playing = True
+        # Recorded time shown on screen: advances with the wall clock while
+        # playing, so a replay runs at the speed it was recorded whatever
+        # the physics rate and frame rate were.
+        replay_time = trajectory.time(0)
+        replay_frame = 0
+        scrub_slider = Slider(x=100, y=650, width=850, height=25,
+                              min_val=0, max_val=max(1, len(trajectory) - 1), initial_val=0)
+    else:
+        if ensemble:
+            sim = Ensemble(replicas, num_molecules, temp_slider.value, piston_slider.value, gamma,
+                           container=(container_left, container_top, container_bottom),
+                           seed=seed, shown=replica)
+        elif sim is None:
+            sim = Simulation(num_molecules, temp_slider.value, piston_slider.value, gamma,
+                             physics=physics, container=(container_left, container_top, container_bottom),
+                             seed=seed)
+        else:
+            # Resume with the sliders where they were saved.
+            num_molecules = sim.num_molecules
+            for slider, value in ((piston_slider, sim.piston), (temp_slider, sim.temperature)):
+                slider.value = value
+                slider.handle_x = slider.value_to_pos(value)
+        sim.profiler = profiler
+        if record:
+            recorder = TrajectoryRecorder(record, num_molecules, molecule_radius)
+        if threaded:
+            # Physics runs at a fixed timestep on its own thread; this loop only
+            # sends input and draws interpolated snapshots.
+            worker = PhysicsWorker(sim, physics_dt, substeps, recorder=recorder, stats=stats)
+            worker.start()
+
+        def control(name, *args):
+            # Slider input goes through the worker's command queue when threaded.
+            if worker is not None:
+                worker.send(name, *args)
+            elif callable(name):
+                name(sim, *args)
+            else:
+                getattr(sim, name)(*args)
+
+    if render == "auto":
+        # Individual sprites stop being readable (and affordable) for huge runs.
+        render = "sprites" if num_molecules <= SPRITE_LIMIT else "density"
+    renderer = Renderer((screen_width, screen_height), (container_left, container_top, container_bottom),
+                        molecule_radius, temp_slider.max_val, profiler, render)
+    # Lowers (and restores) trails, antialiasing, physics sub-steps and the
+    # share of molecules drawn to hold target_fps; 0 turns it off.
+    governor = None
+    if target_fps:
+        governor = QualityGovernor(target_fps, quality_levels(substeps if worker is not None else 1))
 
     running = True
     while running:
-        dt = clock.tick(60)
+        with profiler.phase("frame wait"):
+            dt = clock.tick(target_fps or 60)
         dt_sec = dt / 1000.0
+        if governor is not None:
+            quality = governor.update(dt, clock.get_rawtime())
+            if quality is not None:
+                renderer.set_quality(quality)
+                if worker is not None:
+                    worker.substeps = quality.substeps
 
         # Event handling
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            piston_slider.handle_event(event)
-            temp_slider.handle_event(event)
-
-        # --- Coupling Logic ---
-        # Effective length (analogous to volume) of the container:
-        L = piston_slider.value - container_left
-        if L < 1:  # Prevent division by zero.
-            L = 1
-
-        if temp_slider.dragging:
-            # Temperature slider is active:
-            # This simulates adding/removing energy.
-            # Update the energy state K without changing the volume.
-            K = temp_slider.value * (L ** (gamma - 1))
-        elif piston_slider.dragging:
-            # Piston slider is active:
-            # Change in volume causes an adiabatic change in temperature.
-            # Calculate the new temperature from the current energy state.
-            new_T = K / (L ** (gamma - 1))
-            # Update the temperature slider value accordingly.
-            temp_slider.value = new_T
-            temp_slider.handle_x = temp_slider.value_to_pos(new_T)
-        # --- Update Simulation ---
-
-
-        # Update physics and relationships
-        volume = (piston_slider.value - container_left) * container_height
-
-
-        # Update molecules
-        container_rect = (container_left, container_top, piston_slider.value, container_bottom)
-        for i in range(num_molecules):
-            for j in range(i + 1, num_molecules):
-                molecules[i].check_collision(molecules[j])
-        for molecule in molecules:
-            molecule.update(dt_sec, temp_slider.value, container_rect)
-
-        # Calculate metrics
-        volume = (piston_slider.value - container_left) * container_height
-        pressure = (num_molecules * temp_slider.value / volume) * 50 if volume != 0 else 0
+        with profiler.phase("event handling"):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    profiler.toggle()
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F5:
+                    if not profiler.tracing:
+                        # The first press starts recording; the next one writes it.
+                        profiler.tracing = True
+                        print(f"recording a trace, press F5 again to write it to {trace_path}")
+                    else:
+                        count = profiler.export_chrome_trace(trace_path)
+                        if count:
+                            print(f"wrote {count} trace events to {trace_path}")
+                        else:
+                            print(f"wrote an empty trace to {trace_path}: no phases were recorded")
+                        if not trace:
+                            # Recording started with F5 stops with it; --trace keeps going.
+                            profiler.tracing = False
+                            profiler.events.clear()
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_g:
+                    show_graphs = not show_graphs
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_z:
+                    renderer.graphs.cycle_level(len(stats.history.levels))
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_TAB and ensemble:
+                    control("show_next")
+                elif (event.type == pygame.KEYDOWN and event.key == pygame.K_F6 and trajectory is None
+                      and not ensemble):
+                    # Saved between physics steps, on the physics thread.
+                    control(save_checkpoint, checkpoint)
+                    print(f"saving checkpoint to {checkpoint}")
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_m:
+                    # Cycle sprites -> points -> density -> temperature.
+                    modes = RENDER_MODES
+                    renderer.render_mode = modes[(modes.index(renderer.render_mode) + 1) % len(modes)]
+                if trajectory is not None:
+                    scrub_slider.handle_event(event)
+                    if event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_SPACE:
+                            playing = not playing
+                        elif event.key == pygame.K_RIGHT:
+                            frame_index = min(frame_index + 1, len(trajectory) - 1)
+                        elif event.key == pygame.K_LEFT:
+                            frame_index = max(frame_index - 1, 0)
+                        elif event.key == pygame.K_HOME:
+                            frame_index = 0
+                        elif event.key == pygame.K_END:
+                            frame_index = len(trajectory) - 1
+                else:
+                    piston_slider.handle_event(event)
+                    temp_slider.handle_event(event)
+
+        if trajectory is not None:
+            # --- Replay ---
+            # Any frame is a constant-time lookup into the memory-mapped file.
+            last_frame = len(trajectory) - 1
+            if scrub_slider.dragging:
+                frame_index = int(round(scrub_slider.value))
+            if frame_index != replay_frame or not playing or scrub_slider.dragging:
+                # Stepped, seeked or paused: carry on from the frame shown.
+                replay_time = trajectory.time(frame_index)
+            elif frame_index < last_frame:
+                replay_time += dt_sec
+                while frame_index < last_frame and trajectory.time(frame_index + 1) <= replay_time:
+                    frame_index += 1
+            replay_frame = frame_index
+            scrub_slider.value = frame_index
+            scrub_slider.handle_x = scrub_slider.value_to_pos(frame_index)
+            state = trajectory.frame(frame_index)
+            # Show the recorded piston and temperature on the (inactive) sliders.
+            piston_slider.value = state.piston
+            piston_slider.handle_x = piston_slider.value_to_pos(state.piston)
+            temp_slider.value = state.temperature
+            temp_slider.handle_x = temp_slider.value_to_pos(state.temperature)
+        else:
+            # --- Coupling Logic ---
+            with profiler.phase("coupling"):
+                if temp_slider.dragging:
+                    # Temperature slider is active:
+                    # This simulates adding/removing energy without changing the volume.
+                    control("set_temperature", temp_slider.value)
+                elif piston_slider.dragging:
+                    # Piston slider is active:
+                    # Change in volume causes an adiabatic change in temperature.
+                    control("move_piston", piston_slider.value)
+
+            # --- Update Simulation ---
+            if worker is not None:
+                state = worker.latest()
+            else:
+                sim.step(dt_sec)
+                with profiler.phase("snapshot"):
+                    state = sim.snapshot()
+                if recorder is not None:
+                    recorder.append(state)
+            if piston_slider.dragging:
+                # Update the temperature slider value accordingly.
+                temp_slider.value = state.temperature
+                temp_slider.handle_x = temp_slider.value_to_pos(state.temperature)
+
+        if worker is None:
+            # The worker samples every step itself; here one frame is one step.
+            with profiler.phase("statistics"):
+                stats.sample(state)
 
         # --- Drawing ---
-        screen.blit(background, (0, 0))
-        
-        # Draw container
-        container_surface = pygame.Surface((piston_slider.value - container_left, container_height), pygame.SRCALPHA)
-        container_surface.fill(CONTAINER_COLOR + (50,))
-        pygame.draw.rect(container_surface, (255, 255, 255, 30),
-                       (0, 0, piston_slider.value - container_left, container_height), 3)
-        screen.blit(container_surface, (container_left, container_top))
-        
-        # Draw glass effect
-        screen.blit(container_glass, (container_left, container_top),
-                  (0, 0, piston_slider.value - container_left, container_height))
-        
-        # Draw piston
-        piston_pos = piston_slider.value
-        screen.blit(piston_texture, (piston_pos - 10, container_top))
-        pygame.draw.line(screen, (200, 210, 220), (piston_pos, container_top),
-                        (piston_pos, container_bottom), 4)
-        
-        # Draw molecules with trails
-        trail_surface.fill((0, 0, 0, 0))  # Clear trail surface
-        for molecule in molecules:
-            # Color based on speed (temperature)
-            max_speed = 0.2 * temp_slider.max_val  # Calculate based on max temperature
-            speed_ratio = molecule.speed / max_speed
-            #speed_ratio = molecule.speed / (5 * temp_slider.max_val)
-            speed_ratio = max(0.0, min(speed_ratio, 1.0))
-            color = tuple(int(a + (b-a)*speed_ratio) for a, b in zip(COLD_COLOR, HOT_COLOR))
-            
-            # Draw trail
-            pygame.gfxdraw.filled_circle(trail_surface, int(molecule.x), int(molecule.y),
-                                       molecule.radius + 1, (*color, 30))
-            
-            # Draw molecule
-            pygame.gfxdraw.filled_circle(screen, int(molecule.x), int(molecule.y),
-                                       molecule.radius + 2, (*color, 200))
-            pygame.gfxdraw.aacircle(screen, int(molecule.x), int(molecule.y),
-                                  molecule.radius + 2, (*color, 200))
-        
-        screen.blit(trail_surface, (0, 0))
-        
-        # Draw sliders with new style
-        def draw_modern_slider(slider, label):
-            # Track
-            pygame.draw.rect(screen, (220, 220, 230),
-                           (slider.x, slider.y + slider.height//2 - 8, slider.width, 16),
-                           border_radius=8)
-            # Handle
-            pygame.draw.circle(screen, ACCENT_COLOR, (slider.handle_x, slider.y + slider.height//2),
-                             slider.handle_radius + 2)
-            pygame.draw.circle(screen, (255, 255, 255), (slider.handle_x, slider.y + slider.height//2),
-                             slider.handle_radius - 2)
-            # Label
-            text = font.render(label, True, (50, 50, 70))
-            screen.blit(text, (slider.x, slider.y - 30))
-
-        draw_modern_slider(piston_slider, "VOLUME")
-        draw_modern_slider(temp_slider, "TEMPERATURE (K)")
-
-        # Draw gauges
-        screen.blit(gauge_bg, (650, 50))
-
-        # Pressure gauge improvements
-        gauge_center_x, gauge_center_y = 710, 110
-        gauge_radius = 40
-        
-        # Background circle for gauge
-        pygame.draw.circle(screen, (230, 230, 230), (gauge_center_x, gauge_center_y), gauge_radius)
-        pygame.draw.circle(screen, ACCENT_COLOR, (gauge_center_x, gauge_center_y), gauge_radius, 2)
-
-        # Tick marks
-        for angle_deg in range(220, -61, -40): # More ticks for clarity
-            angle_rad = math.radians(angle_deg)
-            tick_length = 8
-            tick_start_x = gauge_center_x + (gauge_radius - tick_length) * math.cos(angle_rad)
-            tick_start_y = gauge_center_y + (gauge_radius - tick_length) * math.sin(angle_rad)
-            tick_end_x = gauge_center_x + gauge_radius * math.cos(angle_rad)
-            tick_end_y = gauge_center_y + gauge_radius * math.sin(angle_rad)
-            pygame.draw.line(screen, ACCENT_COLOR, (tick_start_x, tick_start_y), (tick_end_x, tick_end_y), 2)
-        
-        # Pressure needle - more pronounced needle
-        pressure_angle = 220 - (pressure/150)*280
-        needle_length = gauge_radius - 5
-        needle_end_x = gauge_center_x + needle_length * math.cos(math.radians(pressure_angle))
-        needle_end_y = gauge_center_y + needle_length * math.sin(math.radians(pressure_angle))
-        pygame.draw.line(screen, HOT_COLOR, (gauge_center_x, gauge_center_y), (needle_end_x, needle_end_y), 3)
-        pygame.draw.circle(screen, HOT_COLOR, (gauge_center_x, gauge_center_y), 5) # Needle base
-
-        # Text labels
-        pressure_text = large_font.render(f"{pressure:.1f} kPa", True, ACCENT_COLOR)
-        screen.blit(pressure_text, (760, 80))
-        temp_text = large_font.render(f"{temp_slider.value:.0f} K", True, HOT_COLOR)
-        screen.blit(temp_text, (760, 120))
-        vol_text = large_font.render(f"V: {volume//1000:.1f} L", True, COLD_COLOR)
-        screen.blit(vol_text, (760, 160))
-
-        # Add subtle shadow under piston
-        shadow = pygame.Surface((20, container_height), pygame.SRCALPHA)
-        shadow.fill((0, 0, 0, 30))
-        screen.blit(shadow, (piston_slider.value - 5, container_top + 5))
-
-        pygame.display.flip()
-
+        sliders = [(piston_slider, "VOLUME"), (temp_slider, "TEMPERATURE (K)")]
+        if trajectory is not None:
+            state_label = "PLAYING" if playing else "PAUSED"
+            sliders.append((scrub_slider, f"REPLAY {frame_index + 1}/{len(trajectory)} - {state_label}"))
+        caption = f"REPLICA {sim.shown + 1}/{replicas} (TAB)" if ensemble else None
+        dirty = renderer.draw(screen, state, sliders, caption, stats if show_graphs else None)
+
+        with profiler.phase("display flip"):
+            # Push only the regions that changed.
+            pygame.display.update(dirty)
+
+    if worker is not None:
+        worker.stop()
+    if recorder is not None:
+        recorder.close()
+    if trace:
+        profiler.export_chrome_trace(trace)
     pygame.quit()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Gas Laws Simulation - Enhanced")
+    parser.add_argument("--physics", choices=available_backends(), default="stepper",
+                        help="physics backend (e.g. time-stepped or event-driven hard spheres)")
+    parser.add_argument("--molecules", type=int, default=80, help="number of molecules")
+    parser.add_argument("--render", choices=("auto",) + RENDER_MODES, default="auto",
+                        help="molecule drawing mode (M cycles it at runtime)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the initial conditions")
+    parser.add_argument("--replicas", type=int, default=1,
+                        help="run this many independent containers as one batched ensemble "
+                             "(stepper physics only)")
+    parser.add_argument("--replica", type=int, default=0, help="ensemble replica to show first")
+    parser.add_argument("--load", metavar="PATH", help="start from a saved checkpoint")
+    parser.add_argument("--checkpoint", metavar="PATH", default="simulation.ckpt",
+                        help="where F6 saves a checkpoint")
+    parser.add_argument("--record", metavar="PATH", help="record the run to a trajectory file")
+    parser.add_argument("--replay", metavar="PATH", help="replay a recorded trajectory file")
+    parser.add_argument("--no-thread", dest="threaded", action="store_false",
+                        help="step the physics in the render loop instead of a worker thread")
+    parser.add_argument("--physics-dt", type=float, default=1 / 120, help="fixed physics timestep (s)")
+    parser.add_argument("--substeps", type=int, default=1, help="physics sub-steps per timestep")
+    parser.add_argument("--target-fps", type=float, default=60,
+                        help="frame rate the quality governor holds (0 turns it off)")
+    parser.add_argument("--profile", action="store_true", help="start with the profiler overlay on")
+    parser.add_argument("--graphs", action="store_true",
+                        help="start with the statistics graph panel shown (G toggles it)")
+    parser.add_argument("--trace", metavar="PATH", help="record a Chrome/Perfetto trace, written on exit")
+    args = parser.parse_args()
+    if args.replicas < 1:
+        parser.error("--replicas must be at least 1")
+    if args.replicas > 1:
+        # The same combinations headless.py rejects, instead of silently ignoring one.
+        if args.load or args.replay:
+            parser.error("--replicas cannot be combined with --load or --replay")
+        if args.physics != "stepper":
+            parser.error(f"ensembles always use the stepper physics, not {args.physics!r}")
+    main(physics=args.physics, seed=args.seed, record=args.record, replay=args.replay,
+         threaded=args.threaded, physics_dt=args.physics_dt, substeps=args.substeps,
+         profile=args.profile, trace=args.trace, num_molecules=args.molecules,
+         render=args.render, load=args.load, checkpoint=args.checkpoint,
+         replicas=args.replicas, replica=args.replica, target_fps=args.target_fps,
+         graphs=args.graphs)
@@ -0,0 +1,111 @@
+import sys
+from collections import namedtuple
+
+# One rung of the quality ladder. `stride` draws every stride-th molecule;
+# `substeps` is the number of physics sub-steps per fixed timestep.
+Quality = namedtuple("Quality", "trails antialias substeps stride")
+
+
+def quality_levels(substeps=1, min_fraction=0.25):
+    # Best first. Each rung gives up one more thing: first the trails, then
+    # antialiasing, then physics sub-steps, then halves the drawn molecules.
+    levels = [Quality(True, True, substeps, 1),
+              Quality(False, True, substeps, 1),
+              Quality(False, False, substeps, 1)]
+    while substeps > 1:
+        substeps = max(1, substeps // 2)
+        levels.append(Quality(False, False, substeps, 1))
+    stride = 2
+    while 1 / stride >= min_fraction:
+        levels.append(Quality(False, False, substeps, stride))
+        stride *= 2
+    return levels
+
+
+# -------------------------------
+# Adaptive quality governor
+# -------------------------------
+# Fed once per frame with the frame time from clock.tick and the time the
+# frame actually spent working (clock.get_rawtime), it steps down the quality
+# ladder while the target frame rate is missed and back up while there is
+# clear headroom. Both use exponential moving averages and a hysteresis band:
+# a step down needs the frame time above `slow` x the frame budget, a step up
+# needs the working time below `fast` x the budget, each held for `hold`
+# frames, and no change follows another within `cooldown` frames. So a single
+# slow frame never drops quality, and the level does not flap around the
+# threshold. A level that had to be left again right after stepping up to it
+# needs twice as long a run of fast frames before it is tried again.
+class QualityGovernor:
+    def __init__(self, target_fps=60, levels=None, slow=1.1, fast=0.6, hold=30, cooldown=90,
+                 smoothing=0.1, log=sys.stderr):
+        self.target_fps = target_fps
+        self.levels = levels or quality_levels()
+        self.slow = slow
+        self.fast = fast
+        self.hold = hold
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self.log = log
+        self.level = 0
+        self.frame_ms = None
+        self.busy_ms = None
+        self.slow_frames = 0
+        self.fast_frames = 0
+        self.since_change = 0
+        self.frames = 0
+        # Failed step-ups per level; each doubles the hold for the next try.
+        self.failures = {}
+        # (frame number, old level, new level, reason) for every change made.
+        self.decisions = []
+
+    @property
+    def quality(self):
+        return self.levels[self.level]
+
+    @property
+    def budget_ms(self):
+        return 1000.0 / self.target_fps
+
+    def average(self, current, sample):
+        return sample if current is None else current + self.smoothing * (sample - current)
+
+    def update(self, frame_ms, busy_ms=None):
+        # Returns the new Quality if it changed this frame, else None.
+        self.frames += 1
+        self.since_change += 1
+        self.frame_ms = self.average(self.frame_ms, frame_ms)
+        self.busy_ms = self.average(self.busy_ms, frame_ms if busy_ms is None else busy_ms)
+        budget = self.budget_ms
+        self.slow_frames = self.slow_frames + 1 if self.frame_ms > self.slow * budget else 0
+        self.fast_frames = self.fast_frames + 1 if self.busy_ms < self.fast * budget else 0
+        if self.since_change < self.cooldown:
+            return None
+        if self.slow_frames >= self.hold and self.level < len(self.levels) - 1:
+            return self.change(self.level + 1, f"frame time {self.frame_ms:.1f} ms over "
+                                               f"{budget:.1f} ms budget")
+        if self.level > 0 and self.fast_frames >= self.hold * 2 ** self.failures.get(self.level - 1, 0):
+            return self.change(self.level - 1, f"working time {self.busy_ms:.1f} ms of "
+                                               f"{budget:.1f} ms budget")
+        return None
+
+    def change(self, level, reason):
+        old, self.level = self.level, level
+        if level > old and self.decisions and self.since_change <= 2 * self.cooldown:
+            _, previous, current, _ = self.decisions[-1]
+            if previous > current == old:
+                # The last step up, to `old`, did not hold.
+                self.failures[old] = min(self.failures.get(old, 0) + 1, 6)
+        self.decisions.append((self.frames, old, level, reason))
+        self.slow_frames = self.fast_frames = self.since_change = 0
+        if self.log is not None:
+            direction = "down" if level > old else "up"
+            print(f"quality {direction} to level {level}/{len(self.levels) - 1} "
+                  f"{describe(self.quality)}: {reason}", file=self.log)
+        return self.quality
+
+
+def describe(quality):
+    return (f"(trails {'on' if quality.trails else 'off'}, "
+            f"antialias {'on' if quality.antialias else 'off'}, "
+            f"{quality.substeps} substep{'s' if quality.substeps != 1 else ''}, "
+            f"1/{quality.stride} of molecules drawn)")
@@ -0,0 +1,186 @@
+import numpy as np
+import pygame
+from stats import FIELDS
+
+MEASURED_PRESSURE, TEMPERATURE, VOLUME = (
+    FIELDS.index(name) for name in ("measured_pressure", "temperature", "volume"))
+# Time-series lines: (field, label). Pressure is the one measured from wall
+# impulses; the analytic nT/V value only restates the sliders.
+LINES = ((MEASURED_PRESSURE, "P wall"), (TEMPERATURE, "T"), (VOLUME, "V"))
+PANEL_COLOR = (255, 255, 255, 215)
+GRID_COLOR = (210, 215, 230)
+TEXT_COLOR = (50, 50, 70)
+
+
+class AxisRange:
+    # Auto-scaling range of one axis. Between full redraws it only grows (with
+    # some margin), so already drawn segments stay valid; a full redraw fits
+    # it to the samples on screen again, so it also shrinks back.
+    def __init__(self):
+        self.low = self.high = None
+
+    def fit(self, values, refit=False):
+        # Returns True if the range had to change.
+        low, high = float(np.min(values)), float(np.max(values))
+        if not refit and self.low is not None:
+            if self.low <= low and high <= self.high:
+                return False
+            low, high = min(low, self.low), max(high, self.high)
+        margin = 0.25 * (high - low) or 0.05 * abs(high) or 1.0
+        self.low, self.high = low - margin, high + margin
+        return True
+
+    def scale(self, values, size):
+        # Pixel coordinate (0 at the top) of values on an axis `size` pixels long.
+        return (size - 2) - (np.asarray(values) - self.low) / (self.high - self.low) * (size - 3)
+
+
+# -------------------------------
+# Live graph panel
+# -------------------------------
+# A scrolling time series of P, T and V and a P-V diagram, drawn from one
+# level of a StatisticsEngine's history. Both plots live on their own
+# surfaces and are updated incrementally: each frame the time series scrolls
+# left by the number of new samples and only those segments are drawn, and
+# the P-V trace gains one segment per sample. A plot is redrawn in full when
+# a value leaves its axis range, when the time scale changes, and once per
+# plot width (time series) or buffer length (P-V trace), which also drops
+# old samples and shrinks the axes back after an excursion. So the cost per
+# frame does not grow with the length of the run.
+class GraphPanel:
+    def __init__(self, rect, font, colors, trace_color=TEXT_COLOR):
+        self.rect = pygame.Rect(rect)
+        self.font = font
+        # Line colour per entry of LINES, and of the P-V trace.
+        self.colors = colors
+        self.trace_color = trace_color
+        self.level = 0
+        # One header line per quantity, the kinetic energy and the scale.
+        line_height = font.get_linesize()
+        self.header_height = (len(LINES) + 2) * line_height + 8
+        width = self.rect.width - 16
+        plots = self.rect.height - self.header_height - line_height - 16
+        self.series = pygame.Surface((width, plots * 2 // 5))
+        self.diagram = pygame.Surface((width, plots - self.series.get_height()))
+        self.series_ranges = [AxisRange() for _ in LINES]
+        self.volume_range = AxisRange()
+        self.pressure_range = AxisRange()
+        self.series_drawn = self.series_start = None
+        self.diagram_drawn = self.diagram_start = None
+        # Translucent panel behind the header, built once.
+        self.background = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        pygame.draw.rect(self.background, PANEL_COLOR, self.background.get_rect(), border_radius=10)
+        pygame.draw.rect(self.background, (0, 0, 0, 30), self.background.get_rect(), 2, border_radius=10)
+
+    def cycle_level(self, levels):
+        # Zoom the time axis out by one history level (wraps around).
+        self.level = (self.level + 1) % levels
+        self.series_drawn = self.diagram_drawn = None
+
+    # --- Time series ---
+    def redraw_series(self, buffer):
+        surface = self.series
+        surface.fill((255, 255, 255))
+        rows = buffer.latest(surface.get_width())
+        for (field, _), axis in zip(LINES, self.series_ranges):
+            axis.fit(rows[:, field], refit=True)
+        self.draw_series_segments(rows, surface.get_width() - len(rows))
+        self.series_start = buffer.count
+
+    def draw_series_segments(self, rows, x0):
+        # rows[i] is drawn at x0 + i, joined to rows[i - 1].
+        surface = self.series
+        height = surface.get_height()
+        xs = np.arange(x0, x0 + len(rows))
+        for (field, _), axis, color in zip(LINES, self.series_ranges, self.colors):
+            ys = axis.scale(rows[:, field], height)
+            if len(rows) > 1:
+                pygame.draw.lines(surface, color, False, list(zip(xs.tolist(), ys.tolist())), 1)
+
+    def update_series(self, buffer):
+        surface = self.series
+        width = surface.get_width()
+        new = buffer.count - (self.series_drawn or 0)
+        if self.series_drawn is None or buffer.count - self.series_start >= width:
+            # Every sample on screen has scrolled in since the last redraw.
+            self.redraw_series(buffer)
+        elif new > 0:
+            rows = buffer.latest(new + 1)
+            if any(axis.fit(rows[:, field]) for (field, _), axis in zip(LINES, self.series_ranges)):
+                self.redraw_series(buffer)
+            else:
+                surface.scroll(-new, 0)
+                surface.fill((255, 255, 255), (width - new, 0, new, surface.get_height()))
+                self.draw_series_segments(rows, width - new - 1)
+        self.series_drawn = buffer.count
+
+    # --- P-V diagram ---
+    def redraw_diagram(self, buffer):
+        self.diagram.fill((255, 255, 255))
+        rows = buffer.latest()
+        self.volume_range.fit(rows[:, VOLUME], refit=True)
+        self.pressure_range.fit(rows[:, MEASURED_PRESSURE], refit=True)
+        self.draw_diagram_segments(rows)
+        self.diagram_start = buffer.count
+
+    def draw_diagram_segments(self, rows):
+        width, height = self.diagram.get_size()
+        # Volume grows to the right: x is the mirror image of a vertical axis.
+        xs = (width - 1) - self.volume_range.scale(rows[:, VOLUME], width)
+        ys = self.pressure_range.scale(rows[:, MEASURED_PRESSURE], height)
+        points = list(zip(xs.tolist(), ys.tolist()))
+        if len(points) > 1:
+            pygame.draw.lines(self.diagram, self.trace_color, False, points, 1)
+        elif points:
+            self.diagram.set_at(tuple(map(int, points[0])), self.trace_color)
+
+    def update_diagram(self, buffer):
+        capacity = len(buffer.data)
+        new = buffer.count - (self.diagram_drawn or 0)
+        if self.diagram_drawn is None or buffer.count - self.diagram_start >= capacity:
+            # Also drop samples that have left the buffer, once per buffer length.
+            self.redraw_diagram(buffer)
+        elif new > 0:
+            rows = buffer.latest(new + 1)
+            if (self.volume_range.fit(rows[:, VOLUME])
+                    | self.pressure_range.fit(rows[:, MEASURED_PRESSURE])):
+                self.redraw_diagram(buffer)
+            else:
+                self.draw_diagram_segments(rows)
+        self.diagram_drawn = buffer.count
+
+    # --- Panel ---
+    def samples_per_pixel(self, factor):
+        return factor ** self.level
+
+    def draw(self, screen, engine):
+        history = engine.history
+        buffer = history.levels[self.level]
+        # The physics thread may be adding samples meanwhile.
+        with engine.lock:
+            if buffer.count:
+                self.update_series(buffer)
+                self.update_diagram(buffer)
+            summary = engine.summary()
+            count = engine.moments.count
+
+        screen.blit(self.background, self.rect)
+        line_height = self.font.get_linesize()
+        lines = [(f"{label} {summary[FIELDS[field]][0]:.4g} ± {summary[FIELDS[field]][1]:.2g}", color)
+                 for (field, label), color in zip(LINES, self.colors)]
+        ke_mean, ke_std = summary["kinetic_energy"]
+        lines.append((f"KE {ke_mean:.3g} ± {ke_std:.1g}", TEXT_COLOR))
+        lines.append((f"n={count}  1 px={self.samples_per_pixel(history.factor)} steps (Z)", TEXT_COLOR))
+        for row, (text, color) in enumerate(lines):
+            screen.blit(self.font.render(text, True, color),
+                        (self.rect.x + 8, self.rect.y + 6 + row * line_height))
+
+        top = self.rect.y + self.header_height
+        screen.blit(self.series, (self.rect.x + 8, top))
+        label = self.font.render("P-V", True, self.trace_color)
+        diagram_top = top + self.series.get_height() + 8
+        screen.blit(label, (self.rect.x + 8, diagram_top))
+        diagram_top += line_height
+        screen.blit(self.diagram, (self.rect.x + 8, diagram_top))
+        for surface, y in ((self.series, top), (self.diagram, diagram_top)):
+            pygame.draw.rect(screen, GRID_COLOR, (self.rect.x + 8, y, *surface.get_size()), 1)
@@ -0,0 +1,173 @@
+import argparse
+import csv
+import json
+import sys
+import time
+from backends import available_backends
+from simulation import Simulation
+from ensemble import Ensemble
+from recorder import TrajectoryRecorder
+from checkpoint import load_checkpoint, save_checkpoint
+
+# Columns of the P/V/T/energy time series.
+FIELDS = ("step", "time", "pressure", "measured_pressure", "volume", "temperature",
+          "kinetic_energy")
+# Ensemble runs report the mean and variance across replicas of the gauges
+# that differ between them.
+ENSEMBLE_FIELDS = ("step", "time", "pressure", "measured_pressure", "measured_pressure_var",
+                   "volume", "temperature", "kinetic_energy", "kinetic_energy_var")
+
+
+# -------------------------------
+# Headless batch runs (never imports pygame)
+# -------------------------------
+def record(sim):
+    return {
+        "step": sim.step_count,
+        "time": sim.time,
+        "pressure": sim.pressure,
+        "measured_pressure": sim.measured_pressure,
+        "volume": sim.volume,
+        "temperature": sim.temperature,
+        "kinetic_energy": sim.kinetic_energy(),
+    }
+
+
+def record_ensemble(sim):
+    row = {
+        "step": sim.step_count,
+        "time": sim.time,
+        "pressure": sim.pressure,
+        "volume": sim.volume,
+        "temperature": sim.temperature,
+    }
+    for name, (mean, variance) in sim.statistics().items():
+        row[name] = mean
+        row[name + "_var"] = variance
+    return {field: row[field] for field in ENSEMBLE_FIELDS}
+
+
+def run(num_molecules=80, temperature=30, piston=500, gamma=1.4, steps=1000,
+        dt=1 / 60, physics="stepper", seed=None, every=1, trajectory=None,
+        resume=None, checkpoint=None, checkpoint_every=0, replicas=1, brute_force=False):
+    # Step as fast as possible and sample the gauges every `every` steps.
+    # `resume` starts from a saved checkpoint instead of fresh random molecules
+    # (the model parameters then come from the file); `checkpoint` is saved
+    # every `checkpoint_every` steps and once more at the end. With
+    # `replicas` > 1 that many independent containers are stepped as one
+    # batched ensemble and the rows hold ensemble means and variances.
+    # `brute_force` tests every pair for contacts instead of using the grid.
+    sample = record
+    if resume:
+        sim = load_checkpoint(resume)
+    elif replicas > 1:
+        sim = Ensemble(replicas, num_molecules, temperature, piston, gamma, seed=seed,
+                       brute_force=brute_force)
+        sample = record_ensemble
+    else:
+        sim = Simulation(num_molecules, temperature, piston, gamma, physics=physics, seed=seed,
+                         brute_force=brute_force)
+    recorder = TrajectoryRecorder(trajectory, sim.num_molecules) if trajectory else None
+    rows = [sample(sim)]
+    for _ in range(steps):
+        sim.step(dt)
+        if sim.step_count % every == 0:
+            rows.append(sample(sim))
+        if recorder is not None:
+            recorder.append(sim.snapshot())
+        if checkpoint and checkpoint_every and sim.step_count % checkpoint_every == 0:
+            save_checkpoint(sim, checkpoint)
+    if recorder is not None:
+        recorder.close()
+    if checkpoint:
+        save_checkpoint(sim, checkpoint)
+    return rows
+
+
+def write_csv(rows, stream):
+    writer = csv.DictWriter(stream, fieldnames=list(rows[0]) if rows else FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def write_json(rows, stream):
+    json.dump(rows, stream, indent=1)
+    stream.write("\n")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run the gas simulation without a window.")
+    parser.add_argument("--molecules", type=int, default=80, help="number of molecules")
+    parser.add_argument("--temperature", type=float, default=30, help="initial temperature (K)")
+    parser.add_argument("--piston", type=float, default=500, help="piston position (x of the right wall)")
+    parser.add_argument("--gamma", type=float, default=1.4, help="heat capacity ratio")
+    parser.add_argument("--steps", type=int, default=1000, help="number of physics steps")
+    parser.add_argument("--dt", type=float, default=1 / 60, help="seconds per step")
+    parser.add_argument("--physics", choices=available_backends(), default="stepper",
+                        help="physics backend")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the initial conditions")
+    parser.add_argument("--replicas", type=int, default=1,
+                        help="step this many independent containers as one batch and report "
+                             "ensemble means and variances (stepper physics only)")
+    parser.add_argument("--brute-force", action="store_true",
+                        help="find contacts by testing every pair instead of with the grid "
+                             "(slow; for validating the grid search)")
+    parser.add_argument("--every", type=int, default=1, help="sample every N steps")
+    parser.add_argument("--record", metavar="PATH", default=None,
+                        help="also record every frame to a trajectory file for replay")
+    parser.add_argument("--resume", metavar="PATH", default=None,
+                        help="start from a checkpoint and run --steps more steps")
+    parser.add_argument("--checkpoint", metavar="PATH", default=None,
+                        help="save a checkpoint here at the end of the run")
+    parser.add_argument("--checkpoint-every", type=int, default=0, metavar="N",
+                        help="also save the checkpoint every N steps")
+    parser.add_argument("--format", choices=["csv", "json"], default=None,
+                        help="output format (default: from the file extension, else csv)")
+    parser.add_argument("-o", "--output", default="-", help="output file ('-' for stdout)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.steps < 0:
+        parser.error("--steps must not be negative")
+    if args.every < 1:
+        parser.error("--every must be at least 1")
+    if args.checkpoint_every < 0:
+        parser.error("--checkpoint-every must not be negative")
+    if args.replicas < 1:
+        parser.error("--replicas must be at least 1")
+    if args.resume:
+        # The checkpoint carries the whole state, so these would be ignored.
+        ignored = [option for option in ("molecules", "temperature", "piston", "gamma",
+                                         "physics", "seed", "brute_force")
+                   if getattr(args, option) != parser.get_default(option)]
+        if ignored:
+            parser.error("--resume takes the setup from the checkpoint; drop "
+                         + ", ".join(f"--{option}" for option in ignored))
+    if args.replicas > 1 and (args.resume or args.checkpoint):
+        parser.error("checkpoints are not supported for ensemble runs")
+    if args.replicas > 1 and args.physics != "stepper":
+        parser.error(f"ensemble runs always use the stepper physics, not {args.physics!r}")
+    fmt = args.format or ("json" if args.output.endswith(".json") else "csv")
+
+    start = time.perf_counter()
+    rows = run(args.molecules, args.temperature, args.piston, args.gamma, args.steps,
+               args.dt, args.physics, args.seed, args.every, args.record,
+               args.resume, args.checkpoint, args.checkpoint_every, args.replicas,
+               args.brute_force)
+    elapsed = time.perf_counter() - start
+
+    write = write_json if fmt == "json" else write_csv
+    if args.output == "-":
+        write(rows, sys.stdout)
+    else:
+        with open(args.output, "w", newline="") as stream:
+            write(rows, stream)
+    print(f"{args.steps} steps in {elapsed:.2f} s ({args.steps / max(elapsed, 1e-9):.0f} steps/s)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
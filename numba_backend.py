@@ -0,0 +1,111 @@
+import math
+import numba
+import numpy as np
+from backends import VectorizedBackend, register_backend
+
+# -------------------------------
+# JIT-compiled backend
+# -------------------------------
+# Imported by backends.get_backend only when "numba" is asked for, so the
+# other backends (and every entry point using them) never pay Numba's import
+# and compile time.
+
+
+@numba.njit(cache=True)
+def _sweep_one(position, velocity, dt, low, high_start, high_end):
+    # particles.sweep_axis for a single molecule: (position, velocity, impulse).
+    wall_velocity = (high_end - high_start) / dt if dt > 0 else 0.0
+    position = min(max(position, low), max(high_start, low))
+    end = position + velocity * dt
+    if low <= end <= high_end:
+        return end, velocity, 0.0
+    elapsed = 0.0
+    impulse = 0.0
+    for _ in range(8):
+        remaining = dt - elapsed
+        high = high_start + wall_velocity * elapsed
+        t_low = max((low - position) / velocity, 0.0) if velocity < 0 else np.inf
+        t_high = max((high - position) / (velocity - wall_velocity), 0.0) \
+            if velocity > wall_velocity else np.inf
+        t = min(t_low, t_high)
+        if t >= remaining:
+            return position + velocity * remaining, velocity, impulse
+        position += velocity * t
+        bounced = 2 * wall_velocity - velocity if t_high <= t_low else -velocity
+        impulse += abs(bounced - velocity)
+        velocity = bounced
+        elapsed += t
+    position = min(max(position + velocity * (dt - elapsed), low), max(high_end, low))
+    return position, velocity, impulse
+
+
+@numba.njit(cache=True)
+def _update_kernel(x, y, vx, vy, r, dt, left, top, previous_right, right, bottom):
+    # Swept move and bounce in one pass; returns the momentum delivered.
+    impulse = 0.0
+    for k in range(x.shape[0]):
+        x[k], vx[k], dx = _sweep_one(x[k], vx[k], dt, left + r[k], previous_right - r[k],
+                                     right - r[k])
+        y[k], vy[k], dy = _sweep_one(y[k], vy[k], dt, top + r[k], bottom - r[k], bottom - r[k])
+        impulse += dx + dy
+    return impulse
+
+
+@numba.njit(cache=True)
+def _resolve_kernel(x, y, vx, vy, r, i, j):
+    # Same simultaneous response as ParticleSystem.resolve_contacts. Every
+    # pair is evaluated first, then the changes are added in the order
+    # np.add.at applies them there, so both give the same floating-point sums.
+    count = i.shape[0]
+    nx = np.empty(count)
+    ny = np.empty(count)
+    approach = np.empty(count)
+    overlap = np.empty(count)
+    for k in range(count):
+        a, b = i[k], j[k]
+        dx = x[a] - x[b]
+        dy = y[a] - y[b]
+        distance = math.hypot(dx, dy)
+        if distance > 0:
+            nx[k], ny[k] = dx / distance, dy / distance
+        else:
+            nx[k], ny[k] = 1.0, 0.0
+        approach[k] = min((vx[a] - vx[b]) * nx[k] + (vy[a] - vy[b]) * ny[k], 0.0)
+        overlap[k] = 0.5 * (r[a] + r[b] - distance)
+    for k in range(count):
+        vx[i[k]] += -approach[k] * nx[k]
+    for k in range(count):
+        vy[i[k]] += -approach[k] * ny[k]
+    for k in range(count):
+        vx[j[k]] += approach[k] * nx[k]
+    for k in range(count):
+        vy[j[k]] += approach[k] * ny[k]
+    for k in range(count):
+        x[i[k]] += overlap[k] * nx[k]
+    for k in range(count):
+        y[i[k]] += overlap[k] * ny[k]
+    for k in range(count):
+        x[j[k]] += -overlap[k] * nx[k]
+    for k in range(count):
+        y[j[k]] += -overlap[k] * ny[k]
+
+
+@register_backend("numba")
+class NumbaBackend(VectorizedBackend):
+    # The vectorized store with its hot loops compiled by Numba.
+    def step(self, dt):
+        p = self.particles
+        if self.collisions:
+            with self.profiler.phase("collisions"):
+                i, j = p.find_contacts(self.container_rect)
+                if len(i):
+                    _resolve_kernel(p.x, p.y, p.vx, p.vy, p.radius, i, j)
+        with self.profiler.phase("molecule update"):
+            left, top, right, bottom = self.container_rect
+            previous_right = (p.wall_rect or self.container_rect)[2]
+            impulse = _update_kernel(p.x, p.y, p.vx, p.vy, p.radius, float(dt), float(left),
+                                     float(top), float(previous_right), float(right),
+                                     float(bottom))
+            p.wall_impulse += impulse
+            p.wall_rect = tuple(self.container_rect)
+            p.set_temperature(self.temperature)
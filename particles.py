@@ -0,0 +1,273 @@
+import math
+import numpy as np
+
+# At this temperature the RMS speed is speed_factor * T, so the familiar
+# on-screen speed at the default 30 K is kept.
+REFERENCE_TEMPERATURE = 30.0
+
+
+def thermal_speed(temperature, speed_factor):
+    # RMS speed of a gas at `temperature`. It grows with sqrt(T), so the mean
+    # kinetic energy, and with it the measured wall pressure, is proportional
+    # to T as in an ideal gas.
+    return speed_factor * math.sqrt(REFERENCE_TEMPERATURE * max(temperature, 0.0))
+
+# -------------------------------
+# Contact search
+# -------------------------------
+def brute_force_contacts(x, y, radius):
+    # Test every pair via the upper triangle of the distance matrix.
+    dx = x[:, None] - x[None, :]
+    dy = y[:, None] - y[None, :]
+    min_distance = radius[:, None] + radius[None, :]
+    touching = dx * dx + dy * dy < min_distance * min_distance
+    return np.nonzero(np.triu(touching, k=1))
+
+
+# Half of the 3x3 neighbourhood: every pair of neighbouring cells is visited once.
+NEIGHBOUR_OFFSETS = ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+
+
+def grid_contacts(x, y, radius, container_rect, cell_size):
+    # Uniform-grid broad phase over the current container. Returns the same
+    # (i, j) pairs, in the same order, as brute_force_contacts.
+    left, top, right, bottom = container_rect
+    cols = max(1, int(math.ceil((right - left) / cell_size)))
+    rows = max(1, int(math.ceil((bottom - top) / cell_size)))
+    cx = np.clip(((x - left) // cell_size).astype(np.int64), 0, cols - 1)
+    cy = np.clip(((y - top) // cell_size).astype(np.int64), 0, rows - 1)
+    cell = cy * cols + cx
+
+    # Sort molecules by cell; cell_start[c]:cell_start[c + 1] indexes cell c.
+    order = np.argsort(cell, kind="stable")
+    cell_start = np.searchsorted(cell[order], np.arange(rows * cols + 1))
+
+    candidates_i = []
+    candidates_j = []
+    for ox, oy in NEIGHBOUR_OFFSETS:
+        nx = cx + ox
+        ny = cy + oy
+        source = np.nonzero((nx >= 0) & (nx < cols) & (ny < rows))[0]
+        neighbour = ny[source] * cols + nx[source]
+        start = cell_start[neighbour]
+        counts = cell_start[neighbour + 1] - start
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        # Expand every (molecule, neighbour cell) into one candidate per occupant.
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        a = np.repeat(source, counts)
+        b = order[np.repeat(start, counts) + np.arange(total) - first]
+        if ox == 0 and oy == 0:
+            # Same cell: keep each unordered pair once.
+            keep = a < b
+            a = a[keep]
+            b = b[keep]
+        candidates_i.append(a)
+        candidates_j.append(b)
+
+    if not candidates_i:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    a = np.concatenate(candidates_i)
+    b = np.concatenate(candidates_j)
+
+    # Narrow phase.
+    dx = x[a] - x[b]
+    dy = y[a] - y[b]
+    min_distance = radius[a] + radius[b]
+    touching = dx * dx + dy * dy < min_distance * min_distance
+    i = np.minimum(a[touching], b[touching])
+    j = np.maximum(a[touching], b[touching])
+    order = np.lexsort((j, i))
+    return i[order], j[order]
+
+
+# -------------------------------
+# Swept wall collisions
+# -------------------------------
+def sweep_axis(position, velocity, dt, low, high_start, high_end, max_bounces=8):
+    # Moves molecules along one axis for dt between a fixed wall and a wall
+    # (the piston) that moves linearly from high_start to high_end, bouncing
+    # at the exact time of impact. low/high_* bound the molecule centres, so
+    # they already include the radius. A bounce off the moving wall reflects
+    # the velocity relative to it (v -> 2u - v), so a pushing piston hands
+    # molecules its momentum instead of dragging them along, and nothing
+    # tunnels through however far it moves in one step.
+    #
+    # position and velocity are updated in place; returns the momentum each
+    # molecule delivered to the walls (mass 1).
+    shape = position.shape
+    x = position.reshape(-1)
+    v = velocity.reshape(-1)
+    impulse = np.zeros(x.shape)
+
+    # Molecules pushed slightly outside (e.g. by contact separation) start on the wall.
+    np.clip(position, low, np.maximum(high_start, low), out=position)
+    # The gap to each wall changes linearly over the step, so only molecules
+    # that end up beyond a wall can have touched it. Everybody else just flies.
+    end = position + velocity * dt
+    moving = np.nonzero(((end < low) | (end > high_end)).reshape(-1))[0]
+    start = x[moving]
+    x[:] = end.reshape(-1)
+    if not len(moving):
+        return impulse.reshape(shape)
+    x[moving] = start
+
+    def take(bound):
+        return np.broadcast_to(bound, shape).reshape(-1)[moving]
+    low, high_start, high_end = take(low), take(high_start), take(high_end)
+    wall_velocity = (high_end - high_start) / dt if dt > 0 else np.zeros_like(high_start)
+    elapsed = np.zeros(len(moving))
+    # Work on the crossing molecules only; `moving` indexes them in x and v,
+    # `active` the ones among them that are still bouncing.
+    active = np.arange(len(moving))
+    for _ in range(max_bounces):
+        if not len(active):
+            break
+        k = moving[active]
+        xm, vm, um = x[k], v[k], wall_velocity[active]
+        remaining = dt - elapsed[active]
+        high = high_start[active] + um * elapsed[active]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_low = np.where(vm < 0, (low[active] - xm) / vm, np.inf)
+            t_high = np.where(vm > um, (high - xm) / (vm - um), np.inf)
+        t_low = np.maximum(t_low, 0.0)
+        t_high = np.maximum(t_high, 0.0)
+        t = np.minimum(t_low, t_high)
+        hit = t < remaining
+
+        # No more bounces this step: fly the rest of the way.
+        free = k[~hit]
+        x[free] += v[free] * remaining[~hit]
+
+        active, k, t, vm = active[hit], k[hit], t[hit], vm[hit]
+        bounced = np.where(t_high[hit] <= t_low[hit], 2 * um[hit] - vm, -vm)
+        x[k] += vm * t
+        v[k] = bounced
+        impulse[k] += np.abs(bounced - vm)
+        elapsed[active] += t
+    if len(active):
+        # Still bouncing after max_bounces (a nearly closed container): move
+        # and clamp, as the plain wall reflection would.
+        k = moving[active]
+        x[k] = np.clip(x[k] + v[k] * (dt - elapsed[active]),
+                       low[active], np.maximum(high_end[active], low[active]))
+    return impulse.reshape(shape)
+
+
+# -------------------------------
+# Vectorized particle store (struct-of-arrays)
+# -------------------------------
+# Every molecule lives in a slot of a handful of NumPy arrays instead of in
+# its own Molecule object, so one frame of physics is a few array operations
+# no matter how many molecules there are.
+class ParticleSystem:
+    def __init__(self, count, container_rect, temperature, radius=3,
+                 speed_factor=0.5, seed=None, brute_force=False):
+        self.rng = np.random.default_rng(seed)
+        left, top, right, bottom = container_rect
+        # Start at random positions inside the container.
+        self.x = self.rng.uniform(left + 5, right - 5, count)
+        self.y = self.rng.uniform(top + 5, bottom - 5, count)
+        self.radius = np.full(count, float(radius))
+        self.species = np.zeros(count, dtype=np.int32)
+        # Velocities in pixels/second, Maxwell-Boltzmann distributed with the
+        # RMS speed thermal_speed(temperature, speed_factor).
+        self.speed_factor = speed_factor
+        self.vx = np.zeros(count)
+        self.vy = np.zeros(count)
+        self.thermalize(temperature)
+        # Momentum delivered to the walls and piston since the last reset (mass 1).
+        self.wall_impulse = 0.0
+        # Use the O(N^2) pair search instead of the uniform grid (validation only).
+        self.brute_force = brute_force
+        # Container rect of the last update: where the piston starts the next one.
+        self.wall_rect = None
+
+    def __len__(self):
+        return len(self.x)
+
+    # --- Thermostat ---
+    def thermalize(self, temperature):
+        # Draw fresh velocities: in 2D each component is Gaussian. The sample is
+        # scaled so its RMS speed matches the temperature exactly.
+        self.vx[:] = self.rng.standard_normal(len(self))
+        self.vy[:] = self.rng.standard_normal(len(self))
+        self.set_temperature(temperature)
+
+    def rms_speed(self):
+        return math.sqrt(float(np.mean(self.vx * self.vx + self.vy * self.vy))) if len(self) else 0.0
+
+    def set_temperature(self, temperature):
+        # Isokinetic thermostat: one uniform rescale of the whole velocity
+        # array brings the RMS speed to the target, keeping the shape of the
+        # speed distribution. It also absorbs the energy the approximate
+        # (simultaneous) contact response gains or loses in dense frames.
+        self.speed = thermal_speed(temperature, self.speed_factor)
+        current = self.rms_speed()
+        if current > 0:
+            scale = self.speed / current
+            self.vx *= scale
+            self.vy *= scale
+        elif self.speed > 0 and len(self):
+            # Nothing to scale from a standstill.
+            self.thermalize(temperature)
+
+    # --- Motion ---
+    def sweep_walls(self, dt, previous_rect, container_rect):
+        # Swept bounces off the walls while the piston moves from its position
+        # in previous_rect to the one in container_rect over dt.
+        left, top, right, bottom = container_rect
+        r = self.radius
+        impulse = sweep_axis(self.x, self.vx, dt, left + r, previous_rect[2] - r, right - r).sum()
+        impulse += sweep_axis(self.y, self.vy, dt, top + r, bottom - r, bottom - r).sum()
+        self.wall_impulse += float(impulse)
+
+    def find_contacts(self, container_rect):
+        if self.brute_force:
+            return brute_force_contacts(self.x, self.y, self.radius)
+        # Cells must be at least one contact distance wide so that touching
+        # molecules always sit in the same or in neighbouring cells.
+        cell_size = 2 * float(self.radius.max()) if len(self) else 1.0
+        return grid_contacts(self.x, self.y, self.radius, container_rect, cell_size)
+
+    def resolve_contacts(self, i, j):
+        if len(i) == 0:
+            return
+        dx = self.x[i] - self.x[j]
+        dy = self.y[i] - self.y[j]
+        distance = np.hypot(dx, dy)
+        # Coincident centres get an arbitrary (horizontal) contact normal.
+        safe = np.where(distance > 0, distance, 1.0)
+        nx = np.where(distance > 0, dx / safe, 1.0)
+        ny = np.where(distance > 0, dy / safe, 0.0)
+
+        # Elastic collision between equal masses: exchange the velocity
+        # components along the contact normal, but only for approaching pairs
+        # so molecules that are already separating don't stick together.
+        approach = (self.vx[i] - self.vx[j]) * nx + (self.vy[i] - self.vy[j]) * ny
+        approach = np.minimum(approach, 0.0)
+        np.add.at(self.vx, i, -approach * nx)
+        np.add.at(self.vy, i, -approach * ny)
+        np.add.at(self.vx, j, approach * nx)
+        np.add.at(self.vy, j, approach * ny)
+
+        # Separate molecules slightly to avoid sticking.
+        overlap = 0.5 * (self.radius[i] + self.radius[j] - distance)
+        np.add.at(self.x, i, overlap * nx)
+        np.add.at(self.y, i, overlap * ny)
+        np.add.at(self.x, j, -overlap * nx)
+        np.add.at(self.y, j, -overlap * ny)
+
+    def collide(self, container_rect):
+        i, j = self.find_contacts(container_rect)
+        self.resolve_contacts(i, j)
+
+    def update(self, dt, temperature, container_rect):
+        # The piston moves from where the last update left it to its new
+        # position during this step.
+        previous_rect = self.wall_rect or container_rect
+        self.sweep_walls(dt, previous_rect, container_rect)
+        self.wall_rect = tuple(container_rect)
+        self.set_temperature(temperature)
@@ -0,0 +1,101 @@
+import queue
+import threading
+import time
+
+
+def interpolate(previous, current, alpha):
+    # Blend molecule positions between two consecutive physics snapshots.
+    if previous is None or previous is current or len(previous.x) != len(current.x):
+        return current
+    return current._replace(x=previous.x + (current.x - previous.x) * alpha,
+                            y=previous.y + (current.y - previous.y) * alpha)
+
+
+# -------------------------------
+# Fixed-timestep physics worker
+# -------------------------------
+# Runs Simulation.step on its own thread at a fixed dt (optionally split into
+# sub-steps), independent of the render frame rate. Real elapsed time goes
+# into an accumulator that is drained one fixed step at a time, so the
+# simulation speed no longer depends on how fast frames are drawn.
+#
+# The front end never touches the Simulation directly: slider/piston input is
+# sent through a command queue and applied between steps, and the results come
+# back as double-buffered snapshots (previous, current) that the renderer
+# interpolates between.
+class PhysicsWorker(threading.Thread):
+    def __init__(self, sim, dt=1 / 120, substeps=1, max_lag=0.25, recorder=None, stats=None):
+        super().__init__(daemon=True)
+        self.sim = sim
+        self.dt = dt
+        self.substeps = substeps
+        # Never try to catch up more than this much real time after a stall.
+        self.max_lag = max_lag
+        self.recorder = recorder
+        # StatisticsEngine sampled once per published step, not per frame.
+        self.stats = stats
+        self.commands = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.previous = None
+        self.current = sim.snapshot()
+        self.published_at = time.perf_counter()
+
+    # --- Called from the render thread ---
+    def send(self, name, *args):
+        # Queue a Simulation method call, e.g. send("move_piston", 400), or a
+        # function of the simulation, e.g. send(save_checkpoint, path).
+        self.commands.put((name, args))
+
+    def latest(self):
+        with self.lock:
+            previous, current, published_at = self.previous, self.current, self.published_at
+        alpha = min(max((time.perf_counter() - published_at) / self.dt, 0.0), 1.0)
+        return interpolate(previous, current, alpha)
+
+    def stop(self):
+        self.stopping.set()
+        if self.is_alive():
+            self.join()
+
+    # --- Physics thread ---
+    def apply_commands(self):
+        while True:
+            try:
+                name, args = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            if callable(name):
+                name(self.sim, *args)
+            else:
+                getattr(self.sim, name)(*args)
+
+    def publish(self, snapshot):
+        with self.lock:
+            self.previous = self.current
+            self.current = snapshot
+            self.published_at = time.perf_counter()
+        if self.recorder is not None:
+            self.recorder.append(snapshot)
+        if self.stats is not None:
+            self.stats.sample(snapshot)
+
+    def run(self):
+        accumulator = 0.0
+        last = time.perf_counter()
+        while not self.stopping.is_set():
+            now = time.perf_counter()
+            accumulator += min(now - last, self.max_lag)
+            last = now
+
+            self.apply_commands()
+            # Checked every step, so stop() never waits out a catch-up burst
+            # of slow steps.
+            while accumulator >= self.dt and not self.stopping.is_set():
+                for _ in range(self.substeps):
+                    self.sim.step(self.dt / self.substeps)
+                accumulator -= self.dt
+                self.publish(self.sim.snapshot())
+
+            # Sleep until the next fixed step is due.
+            time.sleep(max(0.0, self.dt - accumulator))
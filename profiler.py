@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+
+
+class _NullPhase:
+    # Shared no-op context used while profiling is off.
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+# -------------------------------
+# Per-phase frame profiler
+# -------------------------------
+# Wrap each phase of the main loop in `with profiler.phase("name"):`. While
+# neither enabled nor tracing, phase() hands back a shared no-op context, so
+# instrumented code pays one method call per phase. While enabled, the last
+# `window` durations of every phase are kept for rolling p50/p95, and while
+# tracing every span is kept in a bounded buffer for export as a Chrome /
+# Perfetto trace. Tracing works whether or not the overlay is enabled.
+class FrameProfiler:
+    def __init__(self, enabled=False, window=240, trace=False, max_events=200000):
+        self.enabled = enabled
+        self.window = window
+        self.tracing = trace
+        self.durations = {}
+        self.events = deque(maxlen=max_events)
+        self.origin = time.perf_counter_ns()
+
+    def phase(self, name):
+        if not (self.enabled or self.tracing):
+            return NULL_PHASE
+        return _Phase(self, name)
+
+    def add(self, name, start, end):
+        samples = self.durations.get(name)
+        if samples is None:
+            samples = self.durations[name] = deque(maxlen=self.window)
+        samples.append(end - start)
+        if self.tracing:
+            self.events.append((name, start, end, threading.get_ident()))
+
+    def toggle(self):
+        self.enabled = not self.enabled
+
+    def stats(self):
+        # {phase: (p50 ms, p95 ms)} over the rolling window, in insertion order.
+        result = {}
+        for name, samples in list(self.durations.items()):
+            if samples:
+                p50, p95 = np.percentile(np.fromiter(samples, dtype=np.float64), (50, 95))
+                result[name] = (p50 / 1e6, p95 / 1e6)
+        return result
+
+    def export_chrome_trace(self, path):
+        # Complete ("X") events in microseconds; opens in chrome://tracing or Perfetto.
+        pid = os.getpid()
+        trace = [{"name": name, "ph": "X", "pid": pid, "tid": tid,
+                  "ts": (start - self.origin) / 1000, "dur": (end - start) / 1000}
+                 for name, start, end, tid in list(self.events)]
+        with open(path, "w") as stream:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, stream)
+        return len(trace)
+
+
+# Shared disabled profiler for code paths that were not given one.
+DISABLED = FrameProfiler(enabled=False)
@@ -0,0 +1,133 @@
+import os
+import struct
+import numpy as np
+from simulation import Snapshot
+
+# -------------------------------
+# Trajectory file format
+# -------------------------------
+# <name>      header (64 bytes) followed by fixed-size frame records
+# <name>.idx  one (first_frame, byte_offset, frame_count) uint64 triple per chunk
+#
+# Frames are appended in chunks; a chunk's index entry is written only after
+# its data has been flushed, so a crash mid-chunk loses that chunk and nothing
+# else. Because every frame has the same size, frame i of a memory-mapped file
+# is found in constant time however long the recording is.
+MAGIC = b"GASTRAJ\0"
+# Version 1 stored one shared speed per frame; since version 2 every molecule
+# has its own speed, which readers derive from vx and vy.
+VERSION = 2
+HEADER = struct.Struct("<8sIIdI")
+HEADER_SIZE = 64
+INDEX_DTYPE = np.dtype([("first_frame", "<u8"), ("offset", "<u8"), ("frames", "<u8")])
+
+
+def frame_dtype(num_molecules, version=VERSION):
+    speed = [("speed", "<f8")] if version == 1 else []
+    return np.dtype([
+        ("step", "<i8"),
+        ("time", "<f8"),
+        ("piston", "<f8"),
+        ("temperature", "<f8"),
+        ("pressure", "<f8"),
+        ("measured_pressure", "<f8"),
+        ("volume", "<f8"),
+    ] + speed + [
+        ("x", "<f4", (num_molecules,)),
+        ("y", "<f4", (num_molecules,)),
+        ("vx", "<f4", (num_molecules,)),
+        ("vy", "<f4", (num_molecules,)),
+    ])
+
+
+# -------------------------------
+# Append-only recorder
+# -------------------------------
+class TrajectoryRecorder:
+    def __init__(self, path, num_molecules, radius=3, chunk_frames=64):
+        self.path = path
+        self.dtype = frame_dtype(num_molecules)
+        self.chunk = np.zeros(chunk_frames, dtype=self.dtype)
+        self.pending = 0
+        self.frames = 0
+        self.data = open(path, "wb")
+        self.index = open(path + ".idx", "wb")
+        header = HEADER.pack(MAGIC, VERSION, num_molecules, float(radius), self.dtype.itemsize)
+        self.data.write(header.ljust(HEADER_SIZE, b"\0"))
+
+    def append(self, snapshot):
+        record = self.chunk[self.pending]
+        for name in ("step", "time", "piston", "temperature", "pressure",
+                     "measured_pressure", "volume", "x", "y", "vx", "vy"):
+            record[name] = getattr(snapshot, name)
+        self.pending += 1
+        if self.pending == len(self.chunk):
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        offset = HEADER_SIZE + self.frames * self.dtype.itemsize
+        self.data.write(self.chunk[:self.pending].tobytes())
+        self.data.flush()
+        entry = np.array([(self.frames, offset, self.pending)], dtype=INDEX_DTYPE)
+        self.index.write(entry.tobytes())
+        self.index.flush()
+        self.frames += self.pending
+        self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# -------------------------------
+# Memory-mapped reader
+# -------------------------------
+class Trajectory:
+    def __init__(self, path):
+        with open(path, "rb") as stream:
+            magic, version, num_molecules, radius, itemsize = HEADER.unpack(
+                stream.read(HEADER_SIZE)[:HEADER.size])
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a trajectory file")
+        if version not in (1, VERSION):
+            raise ValueError(f"{path}: unsupported trajectory version {version}")
+        self.version = version
+        self.num_molecules = num_molecules
+        self.radius = radius
+        self.dtype = frame_dtype(num_molecules, version)
+        if self.dtype.itemsize != itemsize:
+            raise ValueError(f"{path}: corrupt header")
+
+        # Only frames covered by the index are trusted.
+        index = np.fromfile(path + ".idx", dtype=INDEX_DTYPE) if os.path.exists(path + ".idx") else []
+        frames = int(index[-1]["first_frame"] + index[-1]["frames"]) if len(index) else 0
+        self.frames = np.memmap(path, dtype=self.dtype, mode="r", offset=HEADER_SIZE,
+                                shape=(frames,)) if frames else np.zeros(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def time(self, i):
+        # Simulated time of frame i, without reading its molecules.
+        return float(self.frames[i]["time"])
+
+    def frame(self, i):
+        record = self.frames[i]
+        if self.version == 1:
+            speed = np.full(self.num_molecules, float(record["speed"]))
+        else:
+            speed = np.hypot(record["vx"], record["vy"])
+        return Snapshot(int(record["step"]), float(record["time"]), record["x"], record["y"],
+                        record["vx"], record["vy"], speed,
+                        float(record["piston"]), float(record["temperature"]),
+                        float(record["pressure"]), float(record["measured_pressure"]),
+                        float(record["volume"]))
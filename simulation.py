@@ -0,0 +1,160 @@
+from collections import namedtuple
+import numpy as np
+from backends import get_backend
+from profiler import DISABLED
+from particles import REFERENCE_TEMPERATURE
+
+# Container geometry of gas_simulator.py: (left, top, bottom). The right wall
+# is the piston.
+CONTAINER = (100, 100, 500)
+# Display scale of the simplified ideal-gas pressure n * T / V.
+PRESSURE_SCALE = 50
+
+
+def kinetic_pressure_scale(speed_factor):
+    # Factor that puts a measured (wall impulse) pressure in the display units
+    # of Simulation.pressure. A 2D ideal gas pushes on its walls with
+    # n <v^2> / (2 V), and <v^2> = speed_factor^2 * REFERENCE_TEMPERATURE * T
+    # (particles.thermal_speed), so the two agree up to this constant.
+    return 2 * PRESSURE_SCALE / (speed_factor ** 2 * REFERENCE_TEMPERATURE)
+
+# Everything a front end (or a file writer) needs to show one moment of a run.
+# x, y, vx, vy and speed are per-molecule arrays.
+Snapshot = namedtuple("Snapshot",
+                      "step time x y vx vy speed piston temperature pressure measured_pressure volume")
+
+
+# -------------------------------
+# Mechanical pressure gauge
+# -------------------------------
+# Sums the momentum the molecules deliver to the walls and piston over the
+# last `window` frames. Per-frame impulses and durations sit in a fixed-size
+# ring buffer with running totals, so adding a frame and reading the gauge are
+# both O(1) however long the window is.
+#
+# `shape` gives one gauge per replica of an ensemble: impulses are then
+# arrays of that shape while the frame durations stay shared.
+class PressureGauge:
+    def __init__(self, window=120, shape=()):
+        self.impulses = np.zeros((window,) + shape)
+        self.durations = np.zeros(window)
+        self.index = 0
+        self.total_impulse = np.zeros(shape) if shape else 0.0
+        self.total_time = 0.0
+
+    def add(self, impulse, dt):
+        i = self.index
+        self.total_impulse += impulse - self.impulses[i]
+        self.total_time += dt - self.durations[i]
+        self.impulses[i] = impulse
+        self.durations[i] = dt
+        self.index = (i + 1) % len(self.impulses)
+
+    def value(self, perimeter):
+        # Force per unit wall length (2D pressure), averaged over the window.
+        if self.total_time <= 0 or perimeter <= 0:
+            return 0.0 * self.total_impulse  # zero, in the gauge's shape
+        return self.total_impulse / (self.total_time * perimeter)
+
+
+# -------------------------------
+# Simulation core (no pygame)
+# -------------------------------
+# Holds the piston/temperature coupling that used to live inside main() and
+# drives one of the registered physics backends (see backends.py), so the
+# physics can run without a window.
+class Simulation:
+    def __init__(self, num_molecules=80, temperature=30, piston=500, gamma=1.4,
+                 physics="stepper", container=CONTAINER, speed_factor=0.5, seed=None,
+                 pressure_window=120, collisions=True, brute_force=False):
+        self.container_left, self.container_top, self.container_bottom = container
+        self.piston = piston
+        self.temperature = temperature
+        # Adiabatic-like coupling: T * L^(gamma-1) = K.
+        self.gamma = gamma
+        self.K = temperature * (self.length ** (gamma - 1))
+        self.speed_factor = speed_factor
+        # `physics` names a registered backend; collisions=False gives main.py's
+        # simpler model where molecules only bounce off the walls, and
+        # brute_force checks every pair for contacts (see Backend).
+        self.backend = self.create_backend(physics, num_molecules, seed, collisions, brute_force)
+        self.pressure_gauge = PressureGauge(pressure_window)
+        # Per-phase timers; replace with an enabled FrameProfiler to measure.
+        self.profiler = DISABLED
+        self.step_count = 0
+        self.time = 0.0
+
+    def create_backend(self, physics, num_molecules, seed, collisions, brute_force):
+        return get_backend(physics)(num_molecules, self.container_rect, self.temperature,
+                                    speed_factor=self.speed_factor, seed=seed,
+                                    collisions=collisions, brute_force=brute_force)
+
+    @property
+    def num_molecules(self):
+        return len(self.backend)
+
+    @property
+    def profiler(self):
+        return self.backend.profiler
+
+    @profiler.setter
+    def profiler(self, profiler):
+        self.backend.profiler = profiler
+
+    @property
+    def container_height(self):
+        return self.container_bottom - self.container_top
+
+    @property
+    def container_rect(self):
+        return (self.container_left, self.container_top, self.piston, self.container_bottom)
+
+    @property
+    def length(self):
+        # Effective length of the container; never zero.
+        return max(1, self.piston - self.container_left)
+
+    @property
+    def volume(self):
+        return (self.piston - self.container_left) * self.container_height
+
+    @property
+    def pressure(self):
+        # Simplified ideal gas law: P ~ (n * T) / V, scaled for visualization.
+        volume = self.volume
+        return (self.num_molecules * self.temperature / volume) * PRESSURE_SCALE if volume != 0 else 0
+
+    @property
+    def measured_pressure(self):
+        # Momentum actually transferred to the walls, per unit time and length.
+        perimeter = 2 * ((self.piston - self.container_left) + self.container_height)
+        return self.pressure_gauge.value(perimeter)
+
+    def kinetic_energy(self):
+        _, _, vx, vy = self.backend.state()
+        return 0.5 * float((vx ** 2 + vy ** 2).sum())
+
+    def set_temperature(self, temperature):
+        # Adding/removing energy: update K without changing the volume.
+        self.temperature = temperature
+        self.K = temperature * (self.length ** (self.gamma - 1))
+
+    def move_piston(self, piston):
+        # A change in volume causes an adiabatic change in temperature.
+        self.piston = piston
+        self.temperature = self.K / (self.length ** (self.gamma - 1))
+
+    def step(self, dt):
+        backend = self.backend
+        backend.set_container(self.container_rect)
+        backend.set_temperature(self.temperature)
+        backend.step(dt)
+        self.pressure_gauge.add(backend.take_wall_impulse(), dt)
+        self.step_count += 1
+        self.time += dt
+
+    def snapshot(self):
+        x, y, vx, vy = self.backend.state()
+        return Snapshot(self.step_count, self.time, x.copy(), y.copy(), vx.copy(), vy.copy(),
+                        np.hypot(vx, vy), self.piston, self.temperature,
+                        self.pressure, self.measured_pressure, self.volume)
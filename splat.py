@@ -0,0 +1,98 @@
+import numpy as np
+import pygame
+
+# Ways the Renderer can draw the molecules; cycled at runtime with M.
+RENDER_MODES = ("sprites", "points", "density", "temperature")
+# Heatmap colour of bins with no molecules in them.
+EMPTY_COLOR = (25, 30, 50)
+
+
+# -------------------------------
+# Pixel-buffer molecule rendering
+# -------------------------------
+# At tens of thousands of molecules, one sprite per molecule is both slow and
+# unreadable. These modes write straight into pixel buffers instead:
+#   points       every molecule is a 2x2 splat, coloured by its speed
+#   density      molecules binned into bin_size pixel cells, coloured by count
+#   temperature  the same bins, coloured by the RMS speed of their molecules
+# The cost is a few array operations over the molecules plus one blit of the
+# container-sized surface, whatever the molecule count.
+class DensitySplat:
+    def __init__(self, cold_color, hot_color, bin_size=4, levels=256):
+        self.bin_size = bin_size
+        ramp = np.linspace(0.0, 1.0, levels)[:, None]
+        empty, cold, hot = (np.array(c, dtype=np.float64) for c in (EMPTY_COLOR, cold_color, hot_color))
+        # Speed palette: cold -> hot.
+        self.palette = (cold + (hot - cold) * ramp).astype(np.uint8)
+        # Density palette: empty -> cold -> hot.
+        low = empty + (cold - empty) * np.minimum(2 * ramp, 1.0)
+        self.density_palette = (low + (hot - cold) * np.maximum(2 * ramp - 1, 0.0)).astype(np.uint8)
+        self.surfaces = {}
+        self.mapped = None
+        self.buffer = np.zeros((0, 0), dtype=np.uint32)
+
+    def surface(self, name, size, colorkey=None):
+        # Reuse a surface per purpose; only resized when the piston moves.
+        surface = self.surfaces.get(name)
+        if surface is None or surface.get_size() != size:
+            surface = self.surfaces[name] = pygame.Surface(size)
+            if colorkey is not None:
+                surface.set_colorkey(colorkey)
+        return surface
+
+    def draw(self, screen, mode, state, container_rect, max_speed):
+        left, top, right, bottom = (int(v) for v in container_rect)
+        width, height = right - left, bottom - top
+        if width <= 0 or height <= 0:
+            return
+        xi = state.x.astype(np.int64) - left
+        yi = state.y.astype(np.int64) - top
+        inside = (xi >= 0) & (xi < width) & (yi >= 0) & (yi < height)
+        xi, yi = xi[inside], yi[inside]
+        ratio = np.clip(state.speed[inside] / max_speed, 0.0, 1.0)
+        if mode == "points":
+            image = self.points(xi, yi, ratio, width, height)
+        else:
+            image = self.heatmap(mode, xi, yi, ratio, width, height)
+        screen.blit(image, (left, top), (0, 0, width, height))
+
+    def points(self, xi, yi, ratio, width, height):
+        surface = self.surface("points", (width, height), colorkey=(0, 0, 0))
+        if self.mapped is None:
+            # Palette as packed pixel values in the surface's own format.
+            self.mapped = np.array([surface.map_rgb(tuple(map(int, color))) for color in self.palette],
+                                   dtype=np.uint32)
+        if self.buffer.shape != (width, height):
+            self.buffer = np.zeros((width, height), dtype=np.uint32)
+        self.buffer.fill(0)
+        colors = self.mapped[(ratio * (len(self.mapped) - 1)).astype(np.intp)]
+        # Scatter into the flat buffer, then copy it to the surface in one go.
+        flat = self.buffer.reshape(-1)
+        for dx, dy in ((0, 0), (1, 0), (0, 1), (1, 1)):
+            flat[np.minimum(xi + dx, width - 1) * height + np.minimum(yi + dy, height - 1)] = colors
+        pygame.surfarray.blit_array(surface, self.buffer)
+        return surface
+
+    def heatmap(self, mode, xi, yi, ratio, width, height):
+        b = self.bin_size
+        cols, rows = -(-width // b), -(-height // b)
+        # Column-major cell index, matching surfarray's (x, y) layout.
+        cell = (xi // b) * rows + yi // b
+        counts = np.bincount(cell, minlength=cols * rows)
+        if mode == "density":
+            # The mean density maps to a third of the ramp; 3x the mean saturates.
+            mean = max(len(xi) / (cols * rows), 1e-9)
+            level = np.minimum(counts / (3 * mean), 1.0)
+            palette = self.density_palette
+        else:
+            squares = np.bincount(cell, weights=ratio * ratio, minlength=cols * rows)
+            level = np.sqrt(squares / np.maximum(counts, 1))
+            palette = self.palette
+        rgb = palette[(level * (len(palette) - 1)).astype(np.intp)]
+        if mode == "temperature":
+            rgb[counts == 0] = EMPTY_COLOR
+        small = self.surface("bins", (cols, rows))
+        pygame.surfarray.blit_array(small, rgb.reshape(cols, rows, 3))
+        image = self.surface("heatmap", (cols * b, rows * b))
+        pygame.transform.scale(small, (cols * b, rows * b), image)
+        return image
@@ -0,0 +1,66 @@
+import numpy as np
+import pygame
+import pygame.gfxdraw
+
+
+# -------------------------------
+# Pre-rendered molecule sprites
+# -------------------------------
+# Drawing a molecule used to cost a colour computation and three gfxdraw calls.
+# The atlas renders the antialiased molecule and its trail glyph once per
+# colour bucket (cold -> hot), so a frame becomes one Surface.blits call per
+# layer. The glyphs are rebuilt only when the radius, the palette or the
+# antialiasing changes.
+class SpriteAtlas:
+    def __init__(self, cold_color, hot_color, radius=3, buckets=32, antialias=True):
+        self.buckets = buckets
+        self.palette = None
+        self.radius = None
+        self.antialias = None
+        self.rebuild(radius, cold_color, hot_color, antialias)
+
+    def rebuild(self, radius, cold_color, hot_color, antialias=True):
+        if (radius, (cold_color, hot_color), antialias) == (self.radius, self.palette, self.antialias):
+            return
+        self.radius = radius
+        self.palette = (cold_color, hot_color)
+        self.antialias = antialias
+        self.colors = []
+        self.molecules = []
+        self.trails = []
+        size = 2 * (radius + 2) + 1
+        centre = radius + 2
+        for b in range(self.buckets):
+            ratio = b / (self.buckets - 1)
+            color = tuple(int(a + (h - a) * ratio) for a, h in zip(cold_color, hot_color))
+            self.colors.append(color)
+
+            molecule = pygame.Surface((size, size), pygame.SRCALPHA)
+            pygame.gfxdraw.filled_circle(molecule, centre, centre, radius + 2, (*color, 200))
+            if antialias:
+                pygame.gfxdraw.aacircle(molecule, centre, centre, radius + 2, (*color, 200))
+            self.molecules.append(molecule)
+
+            trail = pygame.Surface((size, size), pygame.SRCALPHA)
+            pygame.gfxdraw.filled_circle(trail, centre, centre, radius + 1, (*color, 30))
+            self.trails.append(trail)
+        self.offset = centre
+
+    def set_antialias(self, antialias):
+        self.rebuild(self.radius, *self.palette, antialias)
+
+    def bucket(self, speed_ratio):
+        # Colour bucket for a speed ratio (scalar or array) in [0, 1].
+        ratio = np.clip(speed_ratio, 0.0, 1.0)
+        return np.rint(ratio * (self.buckets - 1)).astype(np.int64)
+
+    def blit_sequence(self, glyphs, xs, ys, buckets):
+        top_left = zip((xs - self.offset).tolist(), (ys - self.offset).tolist())
+        return list(zip(map(glyphs.__getitem__, buckets.tolist()), top_left))
+
+    def draw(self, surface, trail_surface, xs, ys, speed_ratio):
+        # xs, ys: integer pixel centres; speed_ratio: scalar or per molecule.
+        buckets = np.broadcast_to(self.bucket(speed_ratio), np.shape(xs))
+        if trail_surface is not None:
+            trail_surface.blits(self.blit_sequence(self.trails, xs, ys, buckets), doreturn=False)
+        surface.blits(self.blit_sequence(self.molecules, xs, ys, buckets), doreturn=False)
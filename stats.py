@@ -0,0 +1,129 @@
+import threading
+import numpy as np
+
+# Quantities tracked per physics step.
+FIELDS = ("pressure", "measured_pressure", "temperature", "volume", "kinetic_energy")
+
+
+# -------------------------------
+# Single-pass moments (Welford)
+# -------------------------------
+# Mean and variance of every field, updated in one pass with no stored
+# samples, so it never loses precision or grows however long the run is.
+class RunningStats:
+    def __init__(self, width=len(FIELDS)):
+        self.count = 0
+        self.mean = np.zeros(width)
+        self.m2 = np.zeros(width)
+
+    def add(self, values):
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (values - self.mean)
+
+    def reset(self):
+        self.count = 0
+        self.mean[:] = 0.0
+        self.m2[:] = 0.0
+
+    @property
+    def variance(self):
+        # Unbiased sample variance; zero until there are two samples.
+        return self.m2 / (self.count - 1) if self.count > 1 else np.zeros_like(self.m2)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+
+# -------------------------------
+# Ring buffers at several resolutions
+# -------------------------------
+class RingSeries:
+    # The last `capacity` rows of a time series; `count` counts every row ever
+    # appended.
+    def __init__(self, capacity, width):
+        self.data = np.zeros((capacity, width))
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, len(self.data))
+
+    def append(self, row):
+        self.data[self.count % len(self.data)] = row
+        self.count += 1
+
+    def latest(self, n=None):
+        # The newest n rows (all stored rows by default), oldest first.
+        n = len(self) if n is None else min(n, len(self))
+        end = self.count % len(self.data)
+        index = np.arange(end - n, end) % len(self.data)
+        return self.data[index]
+
+
+# Level 0 holds every sample; each further level holds means of `factor`
+# consecutive samples of the level below. With the defaults (6 levels of 512,
+# factor 4) the coarsest level spans about 2.4 hours at 60 samples a second in
+# a fixed 120 kB. Appending touches one extra level every `factor` samples, so
+# it is O(1) amortized.
+class MultiResolutionHistory:
+    def __init__(self, width=len(FIELDS), capacity=512, levels=6, factor=4):
+        self.factor = factor
+        self.levels = [RingSeries(capacity, width) for _ in range(levels)]
+        self.sums = np.zeros((levels, width))
+        self.pending = np.zeros(levels, dtype=np.int64)
+
+    def append(self, row):
+        self.levels[0].append(row)
+        for k in range(1, len(self.levels)):
+            self.sums[k] += row
+            self.pending[k] += 1
+            if self.pending[k] < self.factor:
+                return
+            row = self.sums[k] / self.factor
+            self.sums[k] = 0.0
+            self.pending[k] = 0
+            self.levels[k].append(row)
+
+
+# -------------------------------
+# Streaming statistics engine
+# -------------------------------
+# Fed one Snapshot per physics step (repeated snapshots are ignored), by the
+# PhysicsWorker when the physics runs on its own thread. Keeps the
+# multi-resolution history of every field and Welford moments that start
+# over whenever the piston or temperature setting changes, so they describe
+# the gas at the current settings. Readers on another thread hold `lock`.
+class StatisticsEngine:
+    def __init__(self, capacity=512, levels=6, factor=4):
+        self.history = MultiResolutionHistory(len(FIELDS), capacity, levels, factor)
+        self.moments = RunningStats(len(FIELDS))
+        self.last_step = None
+        self.settings = None
+        self.lock = threading.Lock()
+
+    @property
+    def count(self):
+        return self.history.levels[0].count
+
+    def sample(self, snapshot):
+        # Returns True if the snapshot was new.
+        if snapshot.step == self.last_step:
+            return False
+        self.last_step = snapshot.step
+        row = np.array([snapshot.pressure, snapshot.measured_pressure, snapshot.temperature,
+                        snapshot.volume, 0.5 * float(np.dot(snapshot.speed, snapshot.speed))])
+        settings = (snapshot.piston, snapshot.temperature)
+        with self.lock:
+            if settings != self.settings:
+                self.settings = settings
+                self.moments.reset()
+            self.history.append(row)
+            self.moments.add(row)
+        return True
+
+    def summary(self):
+        # {field: (mean, standard deviation)} at the current settings.
+        return {name: (float(mean), float(std))
+                for name, mean, std in zip(FIELDS, self.moments.mean, self.moments.std)}
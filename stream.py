@@ -0,0 +1,276 @@
+import argparse
+import asyncio
+import socket
+import struct
+import sys
+import threading
+import numpy as np
+from backends import available_backends
+from simulation import Simulation, Snapshot
+from physics_thread import PhysicsWorker
+from particles import thermal_speed
+
+# -------------------------------
+# Wire format
+# -------------------------------
+# Every message is a little-endian uint32 length followed by the payload.
+#
+# hello  sent once on connect: magic, version, container (left, top, bottom),
+#        molecule radius and the velocity scale used by the frames
+# frame  FRAME header (step, time, piston, temperature, pressure,
+#        measured_pressure, volume, molecule count), then four arrays:
+#        x and y as uint16 fractions of the current container, vx and vy as
+#        int16 fractions of the velocity scale
+#
+# Quantizing to 16 bits keeps positions to within 0.01 pixel and costs 8 bytes
+# per molecule instead of 32, so even thousands of molecules at 30 frames a
+# second fit comfortably on a classroom LAN.
+MAGIC = b"GASSTRM\0"
+VERSION = 1
+LENGTH = struct.Struct("<I")
+HELLO = struct.Struct("<8sIddddd")
+FRAME = struct.Struct("<qddddddI")
+POSITION_STEPS = 65535
+VELOCITY_STEPS = 32767
+
+
+def message(payload):
+    return LENGTH.pack(len(payload)) + payload
+
+
+def encode_hello(container, radius, velocity_scale):
+    return message(HELLO.pack(MAGIC, VERSION, *container, radius, velocity_scale))
+
+
+def decode_hello(payload):
+    magic, version, left, top, bottom, radius, velocity_scale = HELLO.unpack(payload)
+    if magic != MAGIC:
+        raise ValueError("not a gas simulation stream")
+    if version != VERSION:
+        raise ValueError(f"unsupported stream version {version}")
+    return (left, top, bottom), radius, velocity_scale
+
+
+def encode_frame(snapshot, container, velocity_scale):
+    left, top, bottom = container
+    width = max(snapshot.piston - left, 1e-9)
+    height = bottom - top
+    x = np.rint(np.clip((snapshot.x - left) / width, 0, 1) * POSITION_STEPS).astype("<u2")
+    y = np.rint(np.clip((snapshot.y - top) / height, 0, 1) * POSITION_STEPS).astype("<u2")
+    vx = np.rint(np.clip(snapshot.vx / velocity_scale, -1, 1) * VELOCITY_STEPS).astype("<i2")
+    vy = np.rint(np.clip(snapshot.vy / velocity_scale, -1, 1) * VELOCITY_STEPS).astype("<i2")
+    header = FRAME.pack(snapshot.step, snapshot.time, snapshot.piston, snapshot.temperature,
+                        snapshot.pressure, snapshot.measured_pressure, snapshot.volume, len(x))
+    return message(header + x.tobytes() + y.tobytes() + vx.tobytes() + vy.tobytes())
+
+
+def decode_frame(payload, container, velocity_scale):
+    # Returns a Snapshot the Renderer can draw like a local one.
+    left, top, bottom = container
+    step, time, piston, temperature, pressure, measured_pressure, volume, count = \
+        FRAME.unpack_from(payload)
+    offset = FRAME.size
+    arrays = []
+    for dtype in ("<u2", "<u2", "<i2", "<i2"):
+        arrays.append(np.frombuffer(payload, dtype, count, offset).astype(np.float64))
+        offset += 2 * count
+    x, y, vx, vy = arrays
+    x = left + x / POSITION_STEPS * (piston - left)
+    y = top + y / POSITION_STEPS * (bottom - top)
+    vx *= velocity_scale / VELOCITY_STEPS
+    vy *= velocity_scale / VELOCITY_STEPS
+    return Snapshot(step, time, x, y, vx, vy, np.hypot(vx, vy), piston, temperature,
+                    pressure, measured_pressure, volume)
+
+
+# -------------------------------
+# Broadcast server (never imports pygame)
+# -------------------------------
+# The physics runs on a PhysicsWorker thread exactly as in the windowed front
+# ends. An asyncio loop samples its newest snapshot `rate` times a second,
+# encodes it once and hands it to every client. Each client has a one-frame
+# mailbox: a new frame replaces one the client has not taken yet, so a slow
+# viewer skips frames instead of queueing them, and neither the physics nor
+# the other viewers ever wait for it.
+class Viewer:
+    def __init__(self, writer):
+        self.writer = writer
+        self.mailbox = asyncio.Queue(maxsize=1)
+        self.sent = 0
+        self.dropped = 0
+
+    def offer(self, frame):
+        if self.mailbox.full():
+            self.mailbox.get_nowait()
+            self.dropped += 1
+        self.mailbox.put_nowait(frame)
+
+    async def send_frames(self):
+        while True:
+            frame = await self.mailbox.get()
+            self.writer.write(frame)
+            await self.writer.drain()
+            self.sent += 1
+
+
+class StreamServer:
+    def __init__(self, sim, host="127.0.0.1", port=8765, rate=30, dt=1 / 120, substeps=1,
+                 radius=3, max_temperature=400):
+        self.sim = sim
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.worker = PhysicsWorker(sim, dt, substeps)
+        self.container = (sim.container_left, sim.container_top, sim.container_bottom)
+        self.radius = radius
+        # Velocities are quantized against the fastest a molecule should ever
+        # be at the hottest slider setting.
+        self.velocity_scale = 4 * thermal_speed(max_temperature, sim.speed_factor)
+        self.viewers = set()
+
+    async def handle(self, reader, writer):
+        viewer = Viewer(writer)
+        peer = writer.get_extra_info("peername")
+        writer.write(encode_hello(self.container, self.radius, self.velocity_scale))
+        self.viewers.add(viewer)
+        print(f"viewer {peer} connected", file=sys.stderr)
+        try:
+            await viewer.send_frames()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.viewers.discard(viewer)
+            writer.close()
+            print(f"viewer {peer} left after {viewer.sent} frames ({viewer.dropped} dropped)",
+                  file=sys.stderr)
+
+    async def broadcast(self):
+        loop = asyncio.get_running_loop()
+        last_step = None
+        while True:
+            started = loop.time()
+            snapshot = self.worker.latest()
+            if self.viewers and snapshot.step != last_step:
+                frame = encode_frame(snapshot, self.container, self.velocity_scale)
+                for viewer in self.viewers:
+                    viewer.offer(frame)
+                last_step = snapshot.step
+            await asyncio.sleep(max(0.0, 1 / self.rate - (loop.time() - started)))
+
+    async def serve(self):
+        self.worker.start()
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"streaming on {self.host}:{self.port}", file=sys.stderr)
+        try:
+            async with server:
+                await self.broadcast()
+        finally:
+            self.worker.stop()
+
+
+# -------------------------------
+# Thin pygame viewer
+# -------------------------------
+def read_message(stream):
+    header = stream.read(LENGTH.size)
+    if len(header) < LENGTH.size:
+        raise ConnectionError("stream closed")
+    (length,) = LENGTH.unpack(header)
+    payload = stream.read(length)
+    if len(payload) < length:
+        raise ConnectionError("stream closed")
+    return payload
+
+
+def view(host="127.0.0.1", port=8765, render="auto"):
+    # Draws the streamed snapshots with gas_simulator's Renderer. A reader
+    # thread keeps only the newest frame, so drawing never falls behind.
+    import pygame
+    from gas_simulator import Renderer, SPRITE_LIMIT
+    from splat import RENDER_MODES
+
+    connection = socket.create_connection((host, port))
+    stream = connection.makefile("rb")
+    container, radius, velocity_scale = decode_hello(read_message(stream))
+    latest = [decode_frame(read_message(stream), container, velocity_scale)]
+    closed = threading.Event()
+
+    def receive():
+        try:
+            while True:
+                latest[0] = decode_frame(read_message(stream), container, velocity_scale)
+        except (ConnectionError, OSError):
+            closed.set()
+    threading.Thread(target=receive, daemon=True).start()
+
+    pygame.init()
+    screen = pygame.display.set_mode((1000, 700))
+    pygame.display.set_caption(f"Gas Laws Simulation - viewing {host}:{port}")
+    clock = pygame.time.Clock()
+    if render == "auto":
+        render = "sprites" if len(latest[0].x) <= SPRITE_LIMIT else "density"
+    renderer = Renderer((1000, 700), container, int(radius), render_mode=render)
+
+    running = True
+    while running and not closed.is_set():
+        clock.tick(60)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_m:
+                modes = RENDER_MODES
+                renderer.render_mode = modes[(modes.index(renderer.render_mode) + 1) % len(modes)]
+        pygame.display.update(renderer.draw(screen, latest[0]))
+
+    connection.close()
+    pygame.quit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a running simulation to remote viewers.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="run the physics and broadcast it")
+    serve_parser.add_argument("--host", default="127.0.0.1",
+                              help="address to listen on (0.0.0.0 for the whole LAN)")
+    serve_parser.add_argument("--port", type=int, default=8765, help="TCP port")
+    serve_parser.add_argument("--rate", type=float, default=30, help="frames per second sent")
+    serve_parser.add_argument("--molecules", type=int, default=80, help="number of molecules")
+    serve_parser.add_argument("--temperature", type=float, default=30, help="initial temperature (K)")
+    serve_parser.add_argument("--piston", type=float, default=500,
+                              help="piston position (x of the right wall)")
+    serve_parser.add_argument("--gamma", type=float, default=1.4, help="heat capacity ratio")
+    serve_parser.add_argument("--physics", choices=available_backends(), default="stepper",
+                              help="physics backend")
+    serve_parser.add_argument("--seed", type=int, default=None, help="seed for the initial conditions")
+    serve_parser.add_argument("--physics-dt", type=float, default=1 / 120,
+                              help="fixed physics timestep (s)")
+
+    view_parser = commands.add_parser("view", help="show a stream in a pygame window")
+    view_parser.add_argument("--host", default="127.0.0.1", help="server address")
+    view_parser.add_argument("--port", type=int, default=8765, help="TCP port")
+    view_parser.add_argument("--render", default="auto",
+                             help="molecule drawing mode, as in gas_simulator.py (M cycles it "
+                                  "at runtime)")
+    args = parser.parse_args(argv)
+
+    if args.command == "view":
+        # Checked here rather than with choices=: splat imports pygame, which
+        # the server side never loads.
+        from splat import RENDER_MODES
+        if args.render not in ("auto",) + RENDER_MODES:
+            view_parser.error(f"argument --render: invalid choice: {args.render!r} "
+                              f"(choose from {', '.join(('auto',) + RENDER_MODES)})")
+        view(args.host, args.port, args.render)
+        return
+    sim = Simulation(args.molecules, args.temperature, args.piston, args.gamma,
+                     physics=args.physics, seed=args.seed)
+    server = StreamServer(sim, args.host, args.port, args.rate, args.physics_dt)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
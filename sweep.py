@@ -0,0 +1,156 @@
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import headless
+from backends import available_backends
+from simulation import CONTAINER
+
+PARAMETERS = ("temperature", "piston", "molecules", "gamma")
+SUMMARY = ("pressure", "measured_pressure", "volume", "temperature_mean", "kinetic_energy", "K")
+
+
+# -------------------------------
+# P-V-T parameter sweeps over a process pool
+# -------------------------------
+def parse_values(text, kind=float):
+    return [kind(value) for value in text.split(",") if value.strip()]
+
+
+def grid(temperatures, pistons, molecules, gammas):
+    for temperature, piston, count, gamma in itertools.product(temperatures, pistons, molecules, gammas):
+        yield {"temperature": temperature, "piston": piston, "molecules": count, "gamma": gamma}
+
+
+def point_key(point):
+    return tuple(point[name] for name in PARAMETERS)
+
+
+def point_seed(point, seed):
+    # Seed of one point, from its parameters and the sweep's base seed. It
+    # does not depend on where the point sits in the grid, so adding values
+    # to a sweep, or reordering it, reruns every old point the same way.
+    text = json.dumps([seed, point_key(point)])
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:4], "little")
+
+
+def run_point(point, steps, dt, physics, seed):
+    # One independent headless run, summarised over its second half so the
+    # initial transient does not bias the averages.
+    rows = headless.run(point["molecules"], point["temperature"], point["piston"], point["gamma"],
+                        steps=steps, dt=dt, physics=physics, seed=seed)
+    tail = rows[len(rows) // 2:]
+
+    def mean(field):
+        return sum(row[field] for row in tail) / len(tail)
+
+    length = max(1, point["piston"] - CONTAINER[0])
+    result = dict(point)
+    result.update({
+        "pressure": mean("pressure"),
+        "measured_pressure": mean("measured_pressure"),
+        "volume": mean("volume"),
+        "temperature_mean": mean("temperature"),
+        "kinetic_energy": mean("kinetic_energy"),
+        "K": point["temperature"] * length ** (point["gamma"] - 1),
+        "seed": seed,
+    })
+    return result
+
+
+def load_results(path, settings):
+    # Completed points from an earlier (possibly interrupted) sweep. The first
+    # line of the file records the run settings; points from a sweep with
+    # different settings are not comparable, so resuming from one is refused.
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path) as stream:
+        for number, line in enumerate(stream):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue  # Torn last line from an interrupted write.
+            if number == 0:
+                if result.get("settings") != settings:
+                    raise ValueError(f"{path} holds a sweep run with different settings "
+                                     f"({result.get('settings')}, not {settings}); "
+                                     f"pass a new --results file")
+                continue
+            results[point_key(result)] = result
+    return results
+
+
+def sweep(points, results_path, steps=500, dt=1 / 60, physics="stepper", seed=0, workers=None):
+    points = list(points)
+    # "point_seeds" marks files whose points are seeded by point_seed.
+    settings = {"steps": steps, "dt": dt, "physics": physics, "seed": seed, "point_seeds": "hash"}
+    results = load_results(results_path, settings)
+    pending = [point for point in points if point_key(point) not in results]
+    print(f"{len(points) - len(pending)} of {len(points)} points already done", file=sys.stderr)
+
+    # Every point gets its own seed so a resumed sweep reproduces a fresh one.
+    with open(results_path, "a") as stream, ProcessPoolExecutor(max_workers=workers) as pool:
+        if stream.tell() == 0:
+            stream.write(json.dumps({"settings": settings}) + "\n")
+            stream.flush()
+        futures = [pool.submit(run_point, point, steps, dt, physics, point_seed(point, seed))
+                   for point in pending]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results[point_key(result)] = result
+            # One JSON line per finished point, flushed so a crash loses nothing.
+            stream.write(json.dumps(result) + "\n")
+            stream.flush()
+            print(f"[{done}/{len(pending)}] {point_key(result)}", file=sys.stderr)
+
+    return [results[point_key(point)] for point in points]
+
+
+def write_table(results, path):
+    fields = PARAMETERS + SUMMARY + ("seed",)
+    with open(path, "w", newline="") as stream:
+        writer = csv.DictWriter(stream, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(sorted(results, key=point_key))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep temperature, piston, molecule count and gamma.")
+    parser.add_argument("--temperatures", default="30,100,200,400", help="comma-separated temperatures")
+    parser.add_argument("--pistons", default="300,500,800", help="comma-separated piston positions")
+    parser.add_argument("--molecules", default="80", help="comma-separated molecule counts")
+    parser.add_argument("--gammas", default="1.4", help="comma-separated heat capacity ratios")
+    parser.add_argument("--steps", type=int, default=500, help="physics steps per point")
+    parser.add_argument("--dt", type=float, default=1 / 60, help="seconds per step")
+    parser.add_argument("--physics", choices=available_backends(), default="stepper",
+                        help="physics backend")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="base seed, hashed with each point's parameters into its seed")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--results", default="sweep_results.jsonl",
+                        help="append-only per-point results, used to resume")
+    parser.add_argument("-o", "--output", default="sweep.csv", help="merged table")
+    args = parser.parse_args(argv)
+
+    points = grid(parse_values(args.temperatures), parse_values(args.pistons),
+                  parse_values(args.molecules, int), parse_values(args.gammas))
+    start = time.perf_counter()
+    try:
+        results = sweep(points, args.results, args.steps, args.dt, args.physics, args.seed, args.workers)
+    except ValueError as error:
+        parser.error(str(error))
+    write_table(results, args.output)
+    print(f"{len(results)} points in {time.perf_counter() - start:.1f} s -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import math
+import pygame
+
+# -------------------------------
+# Slider class for interactive controls
+# -------------------------------
+class Slider:
+    def __init__(self, x, y, width, height, min_val, max_val, initial_val):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.min_val = min_val
+        self.max_val = max_val
+        self.value = initial_val
+        self.handle_radius = height // 2
+        self.handle_x = self.value_to_pos(self.value)
+        self.dragging = False
+
+    def value_to_pos(self, value):
+        # Map a value to a position along the slider track.
+        ratio = (value - self.min_val) / (self.max_val - self.min_val)
+        return self.x + int(ratio * self.width)
+
+    def pos_to_value(self, pos):
+        # Map a horizontal position to a slider value.
+        ratio = (pos - self.x) / self.width
+        value = self.min_val + ratio * (self.max_val - self.min_val)
+        return max(self.min_val, min(self.max_val, value))
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            mx, my = event.pos
+            # If the mouse is on the handle, start dragging.
+            if math.hypot(mx - self.handle_x, my - (self.y + self.height // 2)) <= self.handle_radius:
+                self.dragging = True
+        elif event.type == pygame.MOUSEBUTTONUP:
+            self.dragging = False
+        elif event.type == pygame.MOUSEMOTION and self.dragging:
+            mx, _ = event.pos
+            # Clamp the handle position to the slider bounds.
+            mx = max(self.x, min(self.x + self.width, mx))
+            self.handle_x = mx
+            self.value = self.pos_to_value(mx)
+
+    def draw(self, surface, color_slider=(180, 180, 180), color_handle=(100, 100, 100)):
+        # Draw the slider track.
+        pygame.draw.rect(surface, color_slider, (self.x, self.y + self.height // 2 - 5, self.width, 10))
+        # Draw the handle.
+        pygame.draw.circle(surface, color_handle, (self.handle_x, self.y + self.height // 2), self.handle_radius)